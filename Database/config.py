@@ -1,5 +1,29 @@
 DB_CONFIG = {
     "host": "localhost",
     "port": 27017,
-    "database": "wifi_analysis"
-}
\ No newline at end of file
+    "database": "wifi_analysis",
+
+    # Connection pool shared by everything in the process (see Database/database.py)
+    "max_pool_size": 50,
+    "min_pool_size": 0,
+    "max_idle_time_ms": 60000,
+    "server_selection_timeout_ms": 5000,
+    "connect_timeout_ms": 5000,
+    "socket_timeout_ms": 30000
+}
+
+# Batch ingest endpoint for remote collector agents (see Database/ingest.py)
+INGEST_CONFIG = {
+    # Largest request body accepted, before and after gzip decompression (bytes), and samples per batch
+    "max_body_bytes": 8 * 1024 * 1024,
+    "max_batch_samples": 5000,
+
+    # Batches written to MongoDB at the same time; a batch waits up to queue_wait seconds
+    # for a slot, after that the agent gets 429 and is asked to retry after retry_after seconds
+    "max_concurrent_batches": 4,
+    "queue_wait": 2.0,
+    "retry_after": 5,
+
+    # Seconds an Idempotency-Key is remembered; a batch sent again within that time is not re-applied
+    "idempotency_ttl": 24 * 3600
+}
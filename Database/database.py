@@ -1,7 +1,143 @@
-from pymongo import MongoClient
-from Database.config import DB_CONFIG
+import os
+import atexit
+from datetime import datetime, timezone
+from threading import Lock
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import BulkWriteError
+from Database.config import DB_CONFIG, INGEST_CONFIG
+from Database.rollups import apply_rollups, ensure_rollup_indexes
+
+# One document per measurement (see Database/models.py)
+MEASUREMENTS_COLLECTION = "measurements"
+
+# Old layout: one document per location with every measurement pushed into an array
+LEGACY_COLLECTION = "wifi_data"
+
+# Atomic counters, e.g. one "run_no:<date>" document per day
+COUNTERS_COLLECTION = "counters"
+
+# Idempotency keys of ingested batches, expired by a TTL index (see Database/ingest.py)
+INGEST_BATCHES_COLLECTION = "ingest_batches"
+
+# Status document of the collector process, with its heartbeat (see src/control.py)
+COLLECTOR_CONTROL_COLLECTION = "collector_control"
+
+# One document per named collection job run by the collector (see src/control.py)
+COLLECTION_JOBS_COLLECTION = "collection_jobs"
+
+# Document in the data_versions collection that tracks changes to the measurements
+DATA_VERSION_ID = "wifi_data"
+
+# One pooled MongoClient per process, created on first use
+_client = None
+_client_pid = None
+_client_lock = Lock()
+_shutdown_hook_registered = False
+
+# Function to get the process-wide MongoClient.
+# A client inherited through fork() is never reused: its sockets and monitor threads
+# belong to the parent, so the child lazily builds its own.
+def get_client():
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = MongoClient(
+                    DB_CONFIG["host"], DB_CONFIG["port"],
+                    maxPoolSize=DB_CONFIG["max_pool_size"],
+                    minPoolSize=DB_CONFIG["min_pool_size"],
+                    maxIdleTimeMS=DB_CONFIG["max_idle_time_ms"],
+                    serverSelectionTimeoutMS=DB_CONFIG["server_selection_timeout_ms"],
+                    connectTimeoutMS=DB_CONFIG["connect_timeout_ms"],
+                    socketTimeoutMS=DB_CONFIG["socket_timeout_ms"]
+                )
+                _client_pid = pid
+    return _client
 
 def get_db_connection():
-    client = MongoClient(DB_CONFIG["host"], DB_CONFIG["port"])
-    db = client[DB_CONFIG["database"]]
-    return db
+    return get_client()[DB_CONFIG["database"]]
+
+# Function to check that MongoDB is reachable through the shared client
+def ping_db():
+    try:
+        get_client().admin.command("ping")
+        return True
+    except Exception as e:
+        print(f"❌ MongoDB health check failed: {e}")
+        return False
+
+# Function to close the shared client; the next get_db_connection() opens a new one
+def close_db_connection():
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+# Function to close the shared client when the process exits.
+# Safe to call from several places (web app, collector); the hook is registered once.
+def register_shutdown_hook():
+    global _shutdown_hook_registered
+    with _client_lock:
+        if not _shutdown_hook_registered:
+            atexit.register(close_db_connection)
+            _shutdown_hook_registered = True
+
+# Function to create the indexes used by the loader, the dashboard queries and get_next_run_no
+def ensure_indexes(db):
+    measurements = db[MEASUREMENTS_COLLECTION]
+    measurements.create_index([("location", ASCENDING), ("timestamp", ASCENDING)])
+    measurements.create_index([("date", ASCENDING), ("run_no", ASCENDING)])
+    measurements.create_index([("ingested_at", ASCENDING)])
+    ensure_rollup_indexes(db)
+    db[INGEST_BATCHES_COLLECTION].create_index(
+        [("received_at", ASCENDING)], expireAfterSeconds=INGEST_CONFIG["idempotency_ttl"]
+    )
+
+# Function to insert measurement documents, fold them into the rollups and bump the data version.
+# Documents whose _id already exists are skipped (and not rolled up again),
+# so re-inserting a sample is harmless. Returns the number of documents actually inserted.
+def insert_measurements(db, docs):
+    if not docs:
+        return 0
+    ingested_at = datetime.now(timezone.utc)
+    for doc in docs:
+        doc["ingested_at"] = ingested_at
+    error = None
+    try:
+        db[MEASUREMENTS_COLLECTION].insert_many(docs, ordered=False)
+        inserted = docs
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        if any(write_error.get("code") != 11000 for write_error in write_errors):
+            error = e
+        # With ordered=False every document without a write error was inserted
+        failed = {write_error["index"] for write_error in write_errors}
+        inserted = [doc for index, doc in enumerate(docs) if index not in failed]
+    if inserted:
+        # If this fails the rollups fall behind; "python -m Database.migrate --rebuild-rollups" repairs them
+        apply_rollups(db, inserted)
+        bump_data_version(db)
+    if error is not None:
+        raise error
+    return len(inserted)
+
+# Function to read the current (version, epoch) of the measurements
+def get_data_version(db):
+    doc = db["data_versions"].find_one({"_id": DATA_VERSION_ID}) or {}
+    return doc.get("version", 0), doc.get("epoch", 0)
+
+# Function to bump the version after every write to the measurements, so caches know to refresh.
+# Pass reset=True after deleting or rewriting data: it bumps the epoch as well,
+# which tells incremental readers to drop what they have and reload from scratch.
+def bump_data_version(db, reset=False):
+    increments = {"version": 1}
+    if reset:
+        increments["epoch"] = 1
+    db["data_versions"].update_one(
+        {"_id": DATA_VERSION_ID},
+        {"$inc": increments},
+        upsert=True
+    )
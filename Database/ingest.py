@@ -0,0 +1,212 @@
+import io
+import gzip
+import base64
+import binascii
+import json
+import zlib
+from datetime import datetime, timezone
+from threading import BoundedSemaphore
+from pymongo.errors import DuplicateKeyError
+from Database.config import INGEST_CONFIG
+from Database.database import insert_measurements, INGEST_BATCHES_COLLECTION
+from Database.models import make_measurement, encode_rtts, METRIC_FIELDS, RTT_FIELDS, TIMESTAMP_FORMAT
+
+# Batch ingest for remote collector agents (POST /ingest in app.py):
+#
+#   POST /ingest
+#   Content-Type: application/json
+#   Content-Encoding: gzip                  (optional)
+#   Idempotency-Key: 7d0c...                (optional, unique per batch)
+#
+#   {"agent": "laptop-3", "samples": [
+#       {"sample_id": "3f1c...", "location": "ECC", "position": {"x": 67.12, "y": -43.45},
+#        "timestamp": "2025-04-05 14:03:12", "run_no": 3,
+#        "download_speed": 54.2, "upload_speed": 21.7, "latency_ms": 18.0, ...}
+#   ]}
+#
+# Valid samples are bulk inserted in one insert_many; invalid ones are reported back by index.
+# Retrying is always safe: samples are keyed by sample_id (or "<Idempotency-Key>:<index>"),
+# so MongoDB skips the ones it already has, and a repeated Idempotency-Key gets the stored
+# response of the first attempt without touching the measurements again.
+#
+# At most max_concurrent_batches batches are written at once; the rest are answered
+# 429 (or 503 while MongoDB is unreachable) with a Retry-After header.
+
+MAX_REJECTED_REPORTED = 100
+
+_write_slots = BoundedSemaphore(INGEST_CONFIG["max_concurrent_batches"])
+
+
+class IngestError(Exception):
+    """A request that can't be ingested; `status` is the HTTP status to answer with."""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+# Function to decode a request body: gzip/deflate per Content-Encoding, then JSON.
+# The size limit applies to the decompressed body too, so a small gzip bomb is rejected.
+def decode_body(raw, content_encoding=None, max_bytes=None):
+    max_bytes = max_bytes or INGEST_CONFIG["max_body_bytes"]
+    if len(raw) > max_bytes:
+        raise IngestError(413, f"Body larger than {max_bytes} bytes")
+    encoding = (content_encoding or "identity").strip().lower()
+    try:
+        if encoding == "gzip":
+            with gzip.GzipFile(fileobj=io.BytesIO(raw)) as f:
+                raw = f.read(max_bytes + 1)
+        elif encoding == "deflate":
+            raw = zlib.decompressobj().decompress(raw, max_bytes + 1)
+        elif encoding != "identity":
+            raise IngestError(415, f"Unsupported Content-Encoding '{content_encoding}'")
+    except (OSError, EOFError, zlib.error) as e:
+        raise IngestError(400, f"Body can't be decompressed: {e}")
+    if len(raw) > max_bytes:
+        raise IngestError(413, f"Decompressed body larger than {max_bytes} bytes")
+    try:
+        return json.loads(raw)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise IngestError(400, f"Body is not valid JSON: {e}")
+
+
+def _number(sample, field):
+    value = sample.get(field)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{field} must be a number or null")
+    return float(value)
+
+
+def _timestamp(value):
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be a string")
+    try:
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+    except ValueError:
+        pass
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"timestamp '{value}' is not '{TIMESTAMP_FORMAT}' or ISO 8601")
+    # Measurements store local wall-clock time
+    return timestamp.astimezone().replace(tzinfo=None) if timestamp.tzinfo else timestamp
+
+
+def _rtts(value):
+    # Either a list of round trip times (null for a lost packet) or the packed field, base64-encoded
+    if isinstance(value, list):
+        return encode_rtts([None if rtt is None else float(rtt) for rtt in value])
+    if isinstance(value, str):
+        try:
+            blob = base64.b64decode(value, validate=True)
+        except binascii.Error:
+            raise ValueError("rtts is not valid base64")
+        if len(blob) % 4:
+            raise ValueError("rtts must hold whole float32 values")
+        return blob
+    raise ValueError("rtts must be a list or a base64 string")
+
+
+def _timings(value):
+    # Stage durations in milliseconds, as recorded by the collector (src/timings.py)
+    if not isinstance(value, dict):
+        raise ValueError("timings_ms must be an object")
+    for stage, milliseconds in value.items():
+        if not isinstance(stage, str) or not stage or "." in stage or stage.startswith("$"):
+            raise ValueError(f"Invalid timings_ms stage {stage!r}")
+        if isinstance(milliseconds, bool) or not isinstance(milliseconds, (int, float)):
+            raise ValueError(f"timings_ms.{stage} must be a number")
+    return {stage: float(milliseconds) for stage, milliseconds in value.items()}
+
+
+# Function to validate one sample of a batch and build its measurement document
+def parse_sample(sample, index, idempotency_key=None):
+    if not isinstance(sample, dict):
+        raise ValueError("sample must be an object")
+    location = sample.get("location")
+    if not isinstance(location, str) or not location.strip():
+        raise ValueError("location is required")
+    run_no = sample.get("run_no")
+    if isinstance(run_no, bool) or not isinstance(run_no, int) or run_no < 1:
+        raise ValueError("run_no must be a positive integer")
+    position = sample.get("position") or {}
+    if not isinstance(position, dict):
+        raise ValueError("position must be an object")
+
+    data = {"timestamp": _timestamp(sample.get("timestamp")), "run_no": run_no}
+    for field in METRIC_FIELDS + [field for field in RTT_FIELDS if field != "rtts"]:
+        data[field] = _number(sample, field)
+    if sample.get("rtts") is not None:
+        data["rtts"] = _rtts(sample["rtts"])
+    if sample.get("timings_ms") is not None:
+        data["timings_ms"] = _timings(sample["timings_ms"])
+
+    sample_id = sample.get("sample_id")
+    if sample_id is not None and (not isinstance(sample_id, str) or not sample_id):
+        raise ValueError("sample_id must be a non-empty string")
+    if sample_id is None and idempotency_key:
+        sample_id = f"{idempotency_key}:{index}"
+    return make_measurement(location.strip(), _number(position, "x"), _number(position, "y"), data, sample_id=sample_id)
+
+
+# Function to ingest a decoded batch. Returns the JSON response body; raises IngestError
+# for requests that must be retried (429/503) or are malformed (4xx).
+def ingest_batch(db, payload, idempotency_key=None):
+    if idempotency_key:
+        try:
+            previous = db[INGEST_BATCHES_COLLECTION].find_one({"_id": idempotency_key}, {"response": 1})
+        except Exception as e:
+            print(f"❌ Error looking up Idempotency-Key: {e}")
+            raise IngestError(503, "Database unavailable", retry_after=INGEST_CONFIG["retry_after"])
+        if previous is not None:
+            return {**previous["response"], "replayed": True}
+
+    samples = payload.get("samples") if isinstance(payload, dict) else payload
+    if not isinstance(samples, list):
+        raise IngestError(400, "Expected a list of samples or an object with a 'samples' list")
+    if len(samples) > INGEST_CONFIG["max_batch_samples"]:
+        raise IngestError(413, f"At most {INGEST_CONFIG['max_batch_samples']} samples per batch")
+    agent = payload.get("agent") if isinstance(payload, dict) else None
+
+    docs, rejected = [], []
+    for index, sample in enumerate(samples):
+        try:
+            doc = parse_sample(sample, index, idempotency_key)
+        except (ValueError, TypeError) as e:
+            rejected.append({"index": index, "error": str(e)})
+            continue
+        if agent:
+            doc["agent"] = str(agent)
+        docs.append(doc)
+
+    # Backpressure: only a few batches hit MongoDB at once, the others are told to come back
+    if not _write_slots.acquire(timeout=INGEST_CONFIG["queue_wait"]):
+        raise IngestError(429, "Too many batches in flight", retry_after=INGEST_CONFIG["retry_after"])
+    try:
+        inserted = insert_measurements(db, docs)
+    except Exception as e:
+        print(f"❌ Error ingesting batch from {agent or 'unknown agent'}: {e}")
+        raise IngestError(503, "Database unavailable", retry_after=INGEST_CONFIG["retry_after"])
+    finally:
+        _write_slots.release()
+
+    response = {
+        "received": len(samples),
+        "accepted": inserted,
+        "duplicates": len(docs) - inserted,
+        "rejected": len(rejected),
+        "errors": rejected[:MAX_REJECTED_REPORTED]
+    }
+    if idempotency_key:
+        try:
+            db[INGEST_BATCHES_COLLECTION].insert_one({
+                "_id": idempotency_key, "agent": agent, "response": response,
+                "received_at": datetime.now(timezone.utc)
+            })
+        except DuplicateKeyError:
+            # The same batch was sent twice at once; its samples were deduplicated by id
+            pass
+    return response
@@ -0,0 +1,86 @@
+"""
+Migrate wifi_data from the old per-location array layout to the measurements collection.
+
+    python -m Database.migrate               # copy every measurement into the new layout
+    python -m Database.migrate --drop-legacy # ... and drop the old wifi_data collection afterwards
+    python -m Database.migrate --rebuild-rollups  # only rebuild the rollup collections from the measurements
+    python -m Database.migrate --rssi-to-dbm # convert rssi stored as signal quality (%) to dBm
+
+Each migrated measurement gets the id "<location>:<index in the old array>", so running
+the migration again only adds entries that were pushed to the old layout since.
+Migrated measurements are folded into the rollups as they are inserted.
+
+Windows collectors used to store the netsh signal quality (0..100 %) as rssi, Linux ones dBm.
+rssi is dBm now; --rssi-to-dbm converts the old percentages (the non-negative values) and
+rebuilds the rollups.
+"""
+import argparse
+from Database.database import (
+    get_db_connection, ensure_indexes, insert_measurements, bump_data_version,
+    LEGACY_COLLECTION, MEASUREMENTS_COLLECTION
+)
+from Database.rollups import rebuild_rollups
+from Database.models import measurement_from_legacy, signal_quality_to_dbm
+
+BATCH_SIZE = 5000
+
+
+def migrate_legacy_data(db, drop_legacy=False):
+    ensure_indexes(db)
+    migrated, skipped = 0, 0
+
+    for legacy_doc in db[LEGACY_COLLECTION].find():
+        location = legacy_doc["_id"]
+        batch = []
+        for index, entry in enumerate(legacy_doc.get(location, [])):
+            try:
+                batch.append(measurement_from_legacy(entry, sample_id=f"{location}:{index}"))
+            except Exception as e:
+                skipped += 1
+                print(f"⚠️ Skipping bad record {location}:{index}: {e}")
+                continue
+            if len(batch) >= BATCH_SIZE:
+                migrated += insert_measurements(db, batch)
+                batch = []
+        migrated += insert_measurements(db, batch)
+        print(f"✅ Migrated {location}")
+
+    if drop_legacy:
+        db[LEGACY_COLLECTION].drop()
+        print(f"🗑️ Dropped {LEGACY_COLLECTION}")
+
+    bump_data_version(db, reset=True)
+    print(f"✅ Migration finished: {migrated} measurement(s) copied, {skipped} skipped.")
+    return migrated, skipped
+
+
+def backfill_rollups(db):
+    total = rebuild_rollups(db, MEASUREMENTS_COLLECTION, batch_size=BATCH_SIZE)
+    bump_data_version(db)
+    print(f"✅ Rollups rebuilt from {total} measurement(s).")
+    return total
+
+
+def convert_rssi_to_dbm(db):
+    converted = 0
+    for doc in db[MEASUREMENTS_COLLECTION].find({"rssi": {"$gte": 0}}, {"rssi": 1}):
+        db[MEASUREMENTS_COLLECTION].update_one({"_id": doc["_id"]}, {"$set": {"rssi": signal_quality_to_dbm(doc["rssi"])}})
+        converted += 1
+    print(f"✅ Converted the rssi of {converted} measurement(s) to dBm.")
+    if converted:
+        backfill_rollups(db)
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate wifi_data to one document per measurement")
+    parser.add_argument("--drop-legacy", action="store_true", help="drop the old wifi_data collection afterwards")
+    parser.add_argument("--rebuild-rollups", action="store_true", help="rebuild the rollup collections instead of migrating")
+    parser.add_argument("--rssi-to-dbm", action="store_true", help="convert rssi stored in percent to dBm instead of migrating")
+    args = parser.parse_args()
+    if args.rebuild_rollups:
+        backfill_rollups(get_db_connection())
+    elif args.rssi_to_dbm:
+        convert_rssi_to_dbm(get_db_connection())
+    else:
+        migrate_legacy_data(get_db_connection(), drop_legacy=args.drop_legacy)
@@ -0,0 +1,91 @@
+import math
+import struct
+from datetime import datetime
+from uuid import uuid4
+
+# Layout of the "measurements" collection: one document per measurement
+#
+# {
+#     "_id": "3f1c...",                   # sample id (uuid hex, "<location>:<n>" for migrated data)
+#     "location": "ECC",
+#     "position": {"x": 67.12, "y": -43.45},
+#     "timestamp": datetime,               # local wall-clock time of the measurement
+#     "date": "2025-04-05",                # derived from timestamp, indexed with run_no
+#     "hour": 14,                          # derived from timestamp
+#     "run_no": 3,
+#     "download_speed": 54.2, "upload_speed": 21.7, "latency_ms": 18.0,
+#     "jitter_ms": 1.2, "packet_loss": 0.0,
+#     "rssi": -60,                         # signal level in dBm, see signal_quality_to_dbm()
+#     "rtt_min_ms": 15.1, "rtt_max_ms": 24.9, "rtt_p95_ms": 24.9,   # only when the ping probe ran
+#     "rtts": b"...",                      # every ping round trip time, see encode_rtts()
+#     "timings_ms": {"setup": 3.1, "speed": 18250.4, "ping": 9012.7, ...},   # see src/timings.py,
+#                                          # only when the collector recorded them
+#     "agent": "laptop-3",                 # only for samples sent to POST /ingest by a remote agent
+#     "ingested_at": datetime              # UTC time the document was written
+# }
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+METRIC_FIELDS = ['download_speed', 'upload_speed', 'latency_ms', 'jitter_ms', 'packet_loss', 'rssi']
+
+# Per-packet ping statistics of a sample; not aggregated into the rollups
+RTT_FIELDS = ['rtt_min_ms', 'rtt_max_ms', 'rtt_p95_ms', 'rtts']
+
+
+
+# Function to pack round trip times (ms, None for a lost packet) into the binary rtts field:
+# one little-endian float32 per echo request, NaN for a lost one (stored as BinData)
+def encode_rtts(rtts):
+    return struct.pack(f"<{len(rtts)}f", *(math.nan if rtt is None else rtt for rtt in rtts))
+
+
+# Function to unpack an rtts field into a list of round trip times, None for a lost packet
+def decode_rtts(blob):
+    if not blob:
+        return []
+    values = struct.unpack(f"<{len(blob) // 4}f", bytes(blob))
+    return [None if math.isnan(value) else value for value in values]
+
+
+# Function to convert a signal quality in percent (netsh "Signal", 0..100) to the dBm of the
+# rssi field, with the same linear mapping Windows uses: 0% = -100 dBm, 100% = -50 dBm
+def signal_quality_to_dbm(quality):
+    return round(quality / 2 - 100)
+
+
+# Function to generate a unique id for a new sample
+def new_sample_id():
+    return uuid4().hex
+
+
+# Function to build a measurement document in the flat layout
+def make_measurement(location_name, position_x, position_y, data, sample_id=None):
+    timestamp = data['timestamp']
+    if isinstance(timestamp, str):
+        timestamp = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    timestamp = timestamp.replace(microsecond=0)
+
+    return {
+        "_id": sample_id or new_sample_id(),
+        "location": location_name,
+        "position": {"x": position_x, "y": position_y},
+        "timestamp": timestamp,
+        "date": timestamp.strftime('%Y-%m-%d'),
+        "hour": timestamp.hour,
+        "run_no": data['run_no'],
+        **{field: data.get(field) for field in METRIC_FIELDS},
+        **{field: data[field] for field in RTT_FIELDS if data.get(field) is not None},
+        **({"timings_ms": data["timings_ms"]} if data.get("timings_ms") else {})
+    }
+
+
+# Function to convert an entry of the old per-location array layout into a measurement document.
+# The old layout stored the netsh signal quality in percent as rssi.
+def measurement_from_legacy(entry, sample_id):
+    position = entry['location']
+    if entry.get('rssi') is not None and entry['rssi'] >= 0:
+        entry = {**entry, 'rssi': signal_quality_to_dbm(entry['rssi'])}
+    return make_measurement(
+        position['position[name]'], position.get('position[x]'), position.get('position[y]'),
+        entry, sample_id=sample_id
+    )
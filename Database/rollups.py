@@ -0,0 +1,102 @@
+from pymongo import UpdateOne, ASCENDING
+from Database.models import METRIC_FIELDS
+
+# Pre-aggregated statistics, updated incrementally whenever measurements are inserted.
+# Each rollup document holds, for every metric:
+#
+#   stats.<metric>.n      number of non-null values
+#   stats.<metric>.sum    sum of values
+#   stats.<metric>.sumsq  sum of squared values (for variance / std-dev)
+#   stats.<metric>.min / .max
+#
+# plus "count", the number of measurements rolled into it, and first_timestamp /
+# last_timestamp, the time span it covers.
+
+# Rollup collection -> measurement fields that make up its key
+ROLLUPS = {
+    "rollup_hourly": ["location", "hour"],
+    "rollup_runs": ["location", "date", "run_no"],
+    "rollup_daily": ["location", "date"]
+}
+
+# Secondary indexes used by the dashboard queries (the key is also the _id)
+ROLLUP_INDEXES = {
+    "rollup_hourly": [[("location", ASCENDING), ("hour", ASCENDING)]],
+    "rollup_runs": [[("date", ASCENDING), ("run_no", ASCENDING)], [("location", ASCENDING), ("date", ASCENDING)]],
+    "rollup_daily": [[("location", ASCENDING), ("date", ASCENDING)]]
+}
+
+
+# Function to build the upserts that fold a batch of measurement documents into the rollups.
+# Measurements sharing a rollup key are combined first, so each key costs one update.
+def rollup_updates(docs):
+    groups = {}
+    for doc in docs:
+        for collection, keys in ROLLUPS.items():
+            key = tuple(doc.get(field) for field in keys)
+            group = groups.setdefault((collection, key), {"inc": {"count": 0}, "min": {}, "max": {}})
+            group["inc"]["count"] += 1
+            timestamp = doc.get("timestamp")
+            if timestamp is not None:
+                group["min"]["first_timestamp"] = min(group["min"].get("first_timestamp", timestamp), timestamp)
+                group["max"]["last_timestamp"] = max(group["max"].get("last_timestamp", timestamp), timestamp)
+            for metric in METRIC_FIELDS:
+                value = doc.get(metric)
+                if value is None or value != value:  # skip null and NaN
+                    continue
+                value = float(value)
+                prefix = f"stats.{metric}"
+                inc = group["inc"]
+                inc[f"{prefix}.n"] = inc.get(f"{prefix}.n", 0) + 1
+                inc[f"{prefix}.sum"] = inc.get(f"{prefix}.sum", 0.0) + value
+                inc[f"{prefix}.sumsq"] = inc.get(f"{prefix}.sumsq", 0.0) + value * value
+                group["min"][f"{prefix}.min"] = min(group["min"].get(f"{prefix}.min", value), value)
+                group["max"][f"{prefix}.max"] = max(group["max"].get(f"{prefix}.max", value), value)
+
+    updates = {collection: [] for collection in ROLLUPS}
+    for (collection, key), group in groups.items():
+        key_fields = dict(zip(ROLLUPS[collection], key))
+        update = {"$setOnInsert": key_fields, "$inc": group["inc"]}
+        if group["min"]:
+            update["$min"] = group["min"]
+        if group["max"]:
+            update["$max"] = group["max"]
+        updates[collection].append(UpdateOne({"_id": key_fields}, update, upsert=True))
+    return updates
+
+
+# Function to apply a batch of measurement documents to every rollup collection
+def apply_rollups(db, docs):
+    for collection, operations in rollup_updates(docs).items():
+        if operations:
+            db[collection].bulk_write(operations, ordered=False)
+
+
+def ensure_rollup_indexes(db):
+    for collection, indexes in ROLLUP_INDEXES.items():
+        for index in indexes:
+            db[collection].create_index(index)
+
+
+# Function to rebuild every rollup from the raw measurements (backfill or repair)
+def rebuild_rollups(db, measurements_collection, batch_size=5000):
+    for collection in ROLLUPS:
+        db[collection].delete_many({})
+    ensure_rollup_indexes(db)
+
+    batch, total = [], 0
+    for doc in db[measurements_collection].find():
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            apply_rollups(db, batch)
+            total += len(batch)
+            batch = []
+    apply_rollups(db, batch)
+    total += len(batch)
+    return total
+
+
+# Function to turn the stats of a rollup document into the mean of a metric
+def rollup_mean(doc, metric):
+    stats = doc.get("stats", {}).get(metric) or {}
+    return stats["sum"] / stats["n"] if stats.get("n") else None
@@ -1,13 +1,23 @@
 from flask import Flask, redirect, jsonify, request, render_template
-from threading import Thread
-from src.main import start_collection, stop_collection, stop_event
+from src.control import (request_start, request_stop, read_job, read_control, job_status, collector_alive,
+                         collection_status as get_collection_status, DEFAULT_JOB)
 from dash_app import create_dash_app
-from Database.database import get_db_connection
+from Database.database import get_db_connection, ensure_indexes, ping_db, register_shutdown_hook, MEASUREMENTS_COLLECTION
+from Database.models import decode_rtts
+from Database.ingest import decode_body, ingest_batch, IngestError
+from Database.config import INGEST_CONFIG
 
 proj = Flask(__name__)
-dash_app = create_dash_app(proj)
+# Requests larger than an ingest batch are refused before they are read
+proj.config['MAX_CONTENT_LENGTH'] = INGEST_CONFIG["max_body_bytes"]
+register_shutdown_hook()
+
+try:
+    ensure_indexes(get_db_connection())
+except Exception as e:
+    print(f"❌ Error creating MongoDB indexes: {e}")
 
-collection_thread = None  # Global thread reference
+dash_app = create_dash_app(proj)
 
 @proj.route('/')
 def dashboard():
@@ -17,55 +27,142 @@ def dashboard():
 def showdata():
     try:
         db = get_db_connection()
-        wifi_data_col = db["wifi_data"]
-        data = list(wifi_data_col.find({}, {"_id": 0}).sort("timestamp", -1).limit(100))
+        measurements = db[MEASUREMENTS_COLLECTION]
+        data = list(measurements.find({}, {"_id": 0}).sort("timestamp", -1).limit(100))
+        for doc in data:
+            if "rtts" in doc:
+                doc["rtts"] = decode_rtts(doc["rtts"])
         return jsonify(data)
     except Exception as e:
         return jsonify({"error": str(e)})
 
+@proj.route('/health')
+def health():
+    db_ok = ping_db()
+    return jsonify({"status": "ok" if db_ok else "degraded", "mongodb": db_ok}), (200 if db_ok else 503)
+
+# Batch ingest for remote collector agents (see Database/ingest.py for the format)
+@proj.route('/ingest', methods=['POST'])
+def ingest():
+    try:
+        payload = decode_body(request.get_data(cache=False), request.headers.get('Content-Encoding'))
+        result = ingest_batch(get_db_connection(), payload, request.headers.get('Idempotency-Key'))
+        return jsonify(result), 200
+    except IngestError as e:
+        response = jsonify({"error": str(e)})
+        if e.retry_after is not None:
+            response.headers['Retry-After'] = str(e.retry_after)
+        return response, e.status
+
+# Status of the collector and per-job throughput; "status" is True while any job runs
 @proj.route('/collection/status')
 def collection_status():
-    is_running = collection_thread and collection_thread.is_alive()
-    return {'status': is_running}
+    try:
+        status = get_collection_status()
+    except Exception as e:
+        return {'status': False, 'error': str(e)}, 503
+    return {'status': status['running'], **status}
+
+
+# Collection jobs (see src/jobs.py), run by the collector process
+@proj.route('/jobs', methods=['GET'])
+def list_jobs():
+    try:
+        status = get_collection_status()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"collector_alive": status['collector_alive'], "jobs": status['jobs']})
+
+@proj.route('/jobs', methods=['POST'])
+def start_job():
+    body = request.get_json(silent=True) or {}
+    name = body.get('name') or DEFAULT_JOB
+    try:
+        current = read_job(name)
+        if current is not None and job_status(current, collector_alive(read_control()))['running']:
+            return jsonify({"error": f"Job '{name}' is already running"}), 409
+        request_start(name, body.get('locations'), body.get('mode'), body.get('schedule'))
+        status = get_collection_status()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 503
+    job = next(job for job in status['jobs'] if job['name'] == name)
+    return jsonify({**job, "collector_alive": status['collector_alive']}), 202
+
+@proj.route('/jobs/<name>', methods=['GET'])
+def job_details(name):
+    try:
+        job = read_job(name)
+        alive = collector_alive(read_control())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 503
+    if job is None:
+        return jsonify({"error": f"No job '{name}'"}), 404
+    return jsonify(job_status(job, alive))
+
+@proj.route('/jobs/<name>/stop', methods=['POST'])
+def stop_job(name):
+    try:
+        if not request_stop(name):
+            return jsonify({"error": f"No job '{name}'"}), 404
+        job = job_status(read_job(name), collector_alive(read_control()))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify(job), 202
+
+
+# Stage timing histograms of the collector (see src/timings.py), optionally ?location=...&stage=...
+@proj.route('/metrics')
+def metrics():
+    try:
+        control = read_control()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 503
+    timings = [
+        entry for entry in control.get('timings') or []
+        if request.args.get('location') in (None, entry['location'])
+        and request.args.get('stage') in (None, entry['stage'])
+    ]
+    return jsonify({
+        "collector_alive": collector_alive(control),
+        "updated_at": control.get('heartbeat_at'),
+        "unit": "seconds",
+        "timings": timings
+    })
 
 
 #Combined Start/Stop UI + Logic Route
+# Collection runs in the collector process (python -m src.collector); this page only sends it requests
 @proj.route('/collection', methods=['GET', 'POST'])
 def collection():
-    global collection_thread
     message = ""
-    status = False
-
-    if request.method == 'POST':
-        action = request.form.get('action')
-        if action == 'start':
-            if collection_thread and collection_thread.is_alive():
-                status = True
-                message = "⚠️ Data collection is already running!"
-            else:
-                stop_event.clear()
-                # loc = [['ECC', 67.12, -43.45], ['GEC', 70.21, -40.31], ['SDB', 65.78, -42.5],
-                #        ['FOODCOURT', 68.33, -41.25], ['LOUNGE', 69.0, -39.9]]
-                loc = [['ECC', 67.12, -43.45]]
-                collection_thread = Thread(target=start_collection, args=(loc,))
-                collection_thread.start()
-                status = True
-                message = "🚀 Data Collection Started"
-        elif action == 'stop':
-            stop_collection()
-            if collection_thread and collection_thread.is_alive():
-                collection_thread.join(timeout=5)
-                message = "🛑 Data Collection Stopped"
-            else:
-                message = "⚠️ No active data collection to stop"
-
-    # ✅ Check if thread is still alive after the POST request logic
-    if collection_thread and collection_thread.is_alive():
-        status = True
-    else:
-        status = False
-
-    return render_template("collection.html", message=message, status=status)
+
+    try:
+        status = get_collection_status()
+        if request.method == 'POST':
+            action = request.form.get('action')
+            if action == 'start':
+                if status['running']:
+                    message = "⚠️ Data collection is already running!"
+                elif not status['collector_alive']:
+                    message = "⚠️ Collector is not running, start it with \"python -m src.collector\""
+                else:
+                    request_start()
+                    message = "🚀 Data Collection Started"
+            elif action == 'stop':
+                if status['running']:
+                    request_stop()
+                    message = "🛑 Data Collection Stopped"
+                else:
+                    message = "⚠️ No active data collection to stop"
+            status = get_collection_status()
+        running = status['running']
+    except Exception as e:
+        message = f"❌ Collector state unavailable: {e}"
+        running = False
+
+    return render_template("collection.html", message=message, status=running)
 
 
 # Run app
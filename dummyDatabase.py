@@ -1,16 +1,20 @@
 from datetime import datetime, timedelta
 import random
-from pymongo import MongoClient
-from Database.config import DB_CONFIG
+from Database.database import get_db_connection, ensure_indexes, insert_measurements, bump_data_version, MEASUREMENTS_COLLECTION, COUNTERS_COLLECTION
+from Database.models import make_measurement
+from Database.rollups import ROLLUPS
 
 # Connect to MongoDB
-client = MongoClient(DB_CONFIG["host"], DB_CONFIG["port"])
-db = client[DB_CONFIG["database"]]
-wifi_data_col = db["wifi_data"]
+db = get_db_connection()
+measurements = db[MEASUREMENTS_COLLECTION]
 
 # Clear existing data
-wifi_data_col.delete_many({})
-print("✅ Cleared existing wifi_data collection.")
+measurements.delete_many({})
+db[COUNTERS_COLLECTION].delete_many({})
+for rollup in ROLLUPS:
+    db[rollup].delete_many({})
+ensure_indexes(db)
+print("✅ Cleared existing measurements collection.")
 
 # Dummy locations
 locations = [
@@ -22,6 +26,7 @@ locations = [
 ]
 
 # Generate dummy data for 5 days
+docs = []
 for day_offset in range(5):
     base_date = datetime.now() - timedelta(days=day_offset)
     date_str = base_date.strftime("%Y-%m-%d")
@@ -29,28 +34,21 @@ for day_offset in range(5):
     for run_no in range(1, 3):  # Two runs per day
         for location in locations:
             location_name, x, y = location
-            timestamp = f"{date_str} {random.randint(9, 18)}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d}"
+            timestamp = f"{date_str} {random.randint(9, 18):02d}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d}"
 
             dummy_entry = {
                 "timestamp": timestamp,
                 "run_no": run_no,
-                "location": {
-                    "position[x]": x,
-                    "position[y]": y,
-                    "position[name]": location_name
-                },
                 "download_speed": round(random.uniform(10, 100), 2),
                 "upload_speed": round(random.uniform(5, 50), 2),
                 "latency_ms": round(random.uniform(10, 100), 2),
                 "jitter_ms": round(random.uniform(0, 20), 2),
                 "packet_loss": round(random.uniform(0, 5), 2),
-                "rssi": random.randint(30, 90)
+                "rssi": random.randint(-85, -35)
             }
 
-            wifi_data_col.update_one(
-                {"_id": location_name},
-                {"$push": {location_name: dummy_entry}},
-                upsert=True
-            )
+            docs.append(make_measurement(location_name, x, y, dummy_entry))
 
+insert_measurements(db, docs)
+bump_data_version(db, reset=True)
 print("✅ Dummy data for 5 days inserted successfully.")
@@ -1,10 +1,13 @@
 from dash import Input, Output, html, dcc
-from modules.data_loader import load_wifi_data,prepare_heatmap_data
+from modules.data_loader import load_wifi_data,prepare_heatmap_data,load_navigation_catalog
+from modules.queries import query_location_averages, query_hourly_averages, query_run_trends, query_run_measurement, query_latency_distribution
 import plotly.express as px
 import pandas as pd
 from dash.dependencies import Input, Output, State
 import plotly.graph_objects as go
 from modules.utils import get_pixel_coords
+from modules.downsample import lttb, points_for_width
+import numpy as np
 import dash_bootstrap_components as dbc
 from datetime import datetime
 from plotly.subplots import make_subplots
@@ -25,6 +28,23 @@ PARAMETER_LABELS = {
 
 PARAMETERS = list(PARAMETER_LABELS.keys())
 
+
+# Function to read the visible x-axis window from a relayoutData event of a date axis.
+# Returns (start, end) timestamps, or None when the event is not a zoom on dates.
+def _zoom_window(relayout_data):
+    relayout_data = relayout_data or {}
+    bounds = relayout_data.get('xaxis.range') or [
+        relayout_data.get('xaxis.range[0]'), relayout_data.get('xaxis.range[1]')
+    ]
+    # Category axes report numeric ranges; only date axes report strings
+    if not all(isinstance(bound, str) for bound in bounds):
+        return None
+    try:
+        start, end = pd.to_datetime(bounds[0]), pd.to_datetime(bounds[1])
+    except (ValueError, TypeError):
+        return None
+    return (start, end) if start < end else None
+
 def register_callbacks(dash_app, colors):
     # ════════════════════════════════════════════════════════════════
     # SECTION: MAIN TAB CONTENT RENDERING
@@ -48,7 +68,7 @@ def register_callbacks(dash_app, colors):
                 return html.Div("❌ No data available for overview")
 
             # Get latest run for each location
-            latest_data = df.sort_values('timestamp').groupby('location').last().reset_index()
+            latest_data = df.sort_values('timestamp').groupby('location', observed=True).last().reset_index()
             
             # Define parameters to show
             parameters = {
@@ -398,6 +418,7 @@ def register_callbacks(dash_app, colors):
                 ], style={'display': 'flex', 'gap': '20px', 'marginBottom': '20px', 'flexWrap': 'wrap'}),
 
                 dcc.Graph(id='trends-time-series', className='graph-container'),
+                dcc.Store(id='trends-chart-width'),
                 html.Div(id='hourly-bar-wrapper')  # Shown conditionally
             ])
 
@@ -560,8 +581,43 @@ def register_callbacks(dash_app, colors):
                 dcc.Graph(id='heatmap-graph', className='graph-container')
             ], style={'maxWidth': None, 'margin': '0 auto'})
         elif tab == 'insights':
+            if df.empty:
+                return html.Div("❌ No data available for insights")
+
+            locations = sorted(df['location'].unique())
+            location_options = [{'label': loc, 'value': loc} for loc in locations]
+
             return html.Div([
-                html.H3("🧠 AI-based insights will go here.")
+                html.Div([
+                    html.Div([
+                        html.Div("Location", className='filter-label'),
+                        dcc.Dropdown(
+                            id='insights-location',
+                            options=location_options,
+                            value=locations[0] if len(locations) > 0 else None,
+                            clearable=False,
+                            style={
+                                'width': '200px',
+                                'backgroundColor': 'white',
+                                'color': 'black',
+                                'border': '1px solid #1f2c3e',
+                                'borderRadius': '4px'
+                            }
+                        )
+                    ], className='filter-item'),
+
+                    html.Div([
+                        html.Div("Date Range", className='filter-label'),
+                        dcc.DatePickerRange(
+                            id='insights-date-range',
+                            display_format='YYYY-MM-DD',
+                            style={'margin': '0 10px'}
+                        )
+                    ], className='filter-item'),
+                ], style={'display': 'flex', 'gap': '20px', 'marginBottom': '20px', 'flexWrap': 'wrap'}),
+
+                html.Div(id='insights-latency-summary', style={'color': 'white', 'marginBottom': '10px'}),
+                dcc.Graph(id='insights-latency-distribution', className='graph-container')
             ])
 
         # Default fallback
@@ -632,8 +688,7 @@ def register_callbacks(dash_app, colors):
         Input('run-plot-selector', 'value')
     )
     def render_location_wise_comparison_graphs(selected_location, selected_date, selected_run):
-        df = load_wifi_data()
-        if df.empty or not selected_location or not selected_date or not selected_run:
+        if not selected_location or not selected_date or not selected_run:
             return html.Div("No data available for selected parameters", style={
                 'color': 'white',
                 'backgroundColor': '#1f2c3e',
@@ -643,13 +698,10 @@ def register_callbacks(dash_app, colors):
                 'margin': '20px 0'
             })
 
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
         selected_date_obj = pd.to_datetime(selected_date).date()
-        run_data = df[(df['date'] == selected_date_obj) & 
-                    (df['run_no'] == int(selected_run)) &
-                    (df['location'] == selected_location)]
+        measurement = query_run_measurement(selected_location, str(selected_date_obj), selected_run)
 
-        if len(run_data) == 0:
+        if measurement is None:
             return html.Div("No records found for selected date and run", style={
                 'color': 'white',
                 'backgroundColor': '#1f2c3e',
@@ -659,16 +711,17 @@ def register_callbacks(dash_app, colors):
                 'margin': '20px 0'
             })
 
-        time_str = run_data['timestamp'].iloc[0].strftime('%H:%M:%S')
+        time_str = measurement['timestamp'].strftime('%H:%M:%S')
+        values = {param: measurement.get(param) if measurement.get(param) is not None else float('nan') for param in PARAMETERS}
 
         fig = go.Figure()
         for param in PARAMETERS:
             fig.add_trace(go.Bar(
                 name=PARAMETER_LABELS[param],
                 x=[param],
-                y=[run_data[param].iloc[0]],
+                y=[values[param]],
                 marker_color=colors.get(param, 'gray'),
-                text=[f"{run_data[param].iloc[0]:.2f}{PARAMETER_LABELS[param].split('(')[1].strip(')')}"],
+                text=[f"{values[param]:.2f}{PARAMETER_LABELS[param].split('(')[1].strip(')')}"],
                 textposition='auto',
                 hovertemplate=f"<b>{PARAMETER_LABELS[param]}</b><br>Value: %{{y:.2f}}<br>Time: {time_str}<extra></extra>"
             ))
@@ -703,12 +756,10 @@ def register_callbacks(dash_app, colors):
         Input('date-selector', 'value')
     )
     def load_run_dropdown_options(selected_date):
-        df = load_wifi_data()
-        if df.empty or not selected_date:
+        if not selected_date:
             return []
 
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
-        runs = sorted(df[df['date'] == pd.to_datetime(selected_date).date()]['run_no'].unique())
+        runs = load_navigation_catalog().runs(selected_date)
         return [{'label': f"Run {run}", 'value': str(run)} for run in runs]
 
 
@@ -760,52 +811,65 @@ def register_callbacks(dash_app, colors):
         return new_index, new_location, new_location
 
 
-    # 📊 Update trends time series chart based on selected location, parameters, and date range
+    # 📐 Remember the browser width, so the trends chart knows how many points it can draw
+    dash_app.clientside_callback(
+        "function(_) { return window.innerWidth; }",
+        Output('trends-chart-width', 'data'),
+        Input('trends-time-series', 'id')
+    )
+
+    # 📊 Update trends time series chart based on selected location, parameters, and date range.
+    # Up to one bar per pixel budget the runs are drawn as before; longer ranges switch to a
+    # downsampled line chart over time, and zooming in re-queries the visible window.
     @dash_app.callback(
         Output('trends-time-series', 'figure'),
         Input('trends-location', 'value'),
         Input('trends-parameters', 'value'),
         Input('trends-date-range', 'start_date'),
-        Input('trends-date-range', 'end_date')
+        Input('trends-date-range', 'end_date'),
+        Input('trends-chart-width', 'data'),
+        Input('trends-time-series', 'relayoutData')
     )
-    def render_trend_time_series_chart(location, parameters, start_date, end_date, colors=colors):
-        df = load_wifi_data()
-        if df.empty or not location or not parameters:
+    def render_trend_time_series_chart(location, parameters, start_date, end_date, chart_width, relayout_data, colors=colors):
+        if not location or not parameters:
             return go.Figure()
 
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
-        df['run_label'] = df.apply(lambda row: f"{row['date']} | Run {row['run_no']}", axis=1)
-
-        filtered_df = df[df['location'] == location]
+        # Only zooms on the date axis matter; legend clicks, resizes and category-axis zooms don't
+        window = None
+        ctx = dash.callback_context
+        if ctx.triggered and ctx.triggered[0]['prop_id'].split('.')[0] == 'trends-time-series':
+            window = _zoom_window(relayout_data)
+            if window is None and not (relayout_data or {}).get('xaxis.autorange'):
+                return dash.no_update
 
         # Filter date range
+        start = end = None
         if start_date and end_date:
-            start = pd.to_datetime(start_date).date()
-            end = pd.to_datetime(end_date).date()
-            filtered_df = filtered_df[(filtered_df['date'] >= start) & (filtered_df['date'] <= end)]
+            start = str(pd.to_datetime(start_date).date())
+            end = str(pd.to_datetime(end_date).date())
+        if window is not None:
+            start, end = str(window[0].date()), str(window[1].date())
 
-        # Ensure full run label range exists (to fill missing runs)
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
-        run_label_df = df[['run_label', 'date']].drop_duplicates()
-        if start_date and end_date:
-            run_label_df = run_label_df[(run_label_df['date'] >= start) & (run_label_df['date'] <= end)]
+        runs, averages, bounds = query_run_trends(location, parameters, start, end)
 
-        all_runs = run_label_df[['run_label']].sort_values('run_label')
-        if all_runs.empty:
+        # Ensure full run label range exists (to fill missing runs)
+        if runs.empty:
             return go.Figure()
 
+        max_points = points_for_width(chart_width)
+        if window is not None or len(runs) > max_points:
+            return _render_downsampled_trends(location, parameters, runs, averages, bounds, window, max_points)
+        runs['run_label'] = runs['date'] + ' | Run ' + runs['run_no'].astype(str)
+        averages['run_label'] = averages['date'] + ' | Run ' + averages['run_no'].astype(str)
+        all_runs = runs[['run_label']].sort_values('run_label')
+
         fig = go.Figure()
 
         for param in parameters:
-            global_min = df[param].min()
-            global_max = df[param].max()
-            if global_min == global_max:
-                global_min -= 1
-                global_max += 1
+            global_min, global_max = _normalization_bounds(bounds[param])
 
-            # Compute average per run and merge with all possible run labels
-            param_avg = filtered_df[['run_label', param]].groupby('run_label').mean().reset_index()
-            merged = all_runs.merge(param_avg, on='run_label', how='left')
+            # Merge per-run averages with all possible run labels
+            merged = all_runs.merge(averages[['run_label', param]], on='run_label', how='left')
 
             # Normalize and label
             merged['normalized'] = merged[param].apply(
@@ -851,6 +915,61 @@ def register_callbacks(dash_app, colors):
 
         return fig
 
+    def _normalization_bounds(param_bounds):
+        global_min, global_max = param_bounds
+        if global_min is None or global_max is None:
+            return 0, 1
+        if global_min == global_max:
+            return global_min - 1, global_max + 1
+        return global_min, global_max
+
+    # Line chart over run start times, with at most max_points points per parameter (LTTB)
+    def _render_downsampled_trends(location, parameters, runs, averages, bounds, window, max_points):
+        runs = runs.sort_values('timestamp')
+        if window is not None:
+            runs = runs[(runs['timestamp'] >= window[0]) & (runs['timestamp'] <= window[1])]
+        merged = runs.merge(averages, on=['date', 'run_no'], how='left')
+        merged['run_label'] = merged['date'] + ' | Run ' + merged['run_no'].astype(str)
+        x = merged['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        fig = go.Figure()
+        for param in parameters:
+            global_min, global_max = _normalization_bounds(bounds[param])
+            points = merged.iloc[lttb(x, merged[param].to_numpy(dtype=float), max_points)]
+
+            unit = PARAMETER_LABELS[param].split()[-1].strip("()")
+            fig.add_trace(go.Scattergl(
+                x=points['timestamp'],
+                y=(points[param] - global_min) / (global_max - global_min),
+                mode='lines+markers',
+                marker=dict(size=4, color=colors.get(param, 'gray')),
+                line=dict(color=colors.get(param, 'gray'), width=1),
+                name=PARAMETER_LABELS[param],
+                text=points['run_label'],
+                customdata=points[param].map(lambda value: f"{value:.2f} {unit}"),
+                hovertemplate=(
+                    f"<b>{PARAMETER_LABELS[param]}</b><br>" +
+                    "Run: %{text}<br>" +
+                    "Normalized: %{y:.2f}<br>" +
+                    "Value: %{customdata}<extra></extra>"
+                )
+            ))
+
+        xaxis = dict(type='date')
+        if window is not None:
+            xaxis['range'] = [window[0], window[1]]
+        fig.update_layout(
+            title=f"Normalized Parameter Comparison - {location} ({len(merged)} runs, ≤{max_points} points per trace)",
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            font=dict(color=colors.get('text', 'black')),
+            margin=dict(l=60, r=20, t=50, b=50),
+            xaxis=xaxis,
+            yaxis=dict(range=[-0.02, 1.02], visible=False),
+            showlegend=True
+        )
+        return fig
+
 
     # ⏱ Shift the trends date range using ◀️ ▶️ buttons
     @dash_app.callback(
@@ -869,10 +988,10 @@ def register_callbacks(dash_app, colors):
         if not ctx.triggered or not start_date or not end_date:
             return dash.no_update, dash.no_update, dash.no_update
 
-        df = load_wifi_data()
-        available_dates = sorted(pd.to_datetime(df['timestamp']).dt.date.unique())
+        available_dates = load_navigation_catalog().dates()
         if not available_dates:
             return dash.no_update, dash.no_update, dash.no_update
+        available_dates = [pd.to_datetime(available_dates[0]).date(), pd.to_datetime(available_dates[-1]).date()]
 
         start = pd.to_datetime(start_date).date()
         end = pd.to_datetime(end_date).date()
@@ -904,12 +1023,12 @@ def register_callbacks(dash_app, colors):
         Input('trends-hour', 'value')
     )
     def render_hourly_avg_chart(location, parameter, selected_hour):
-        df = load_wifi_data()
-        if df.empty or not location or selected_hour != 'All Hours':
+        if not location or selected_hour != 'All Hours':
             return None  # Hide container
 
-        filtered = df[df['location'] == location]
-        hourly_avg = filtered.groupby('hour')[parameter].mean().reset_index()
+        hourly_avg = query_hourly_averages(location, parameter)
+        if hourly_avg.empty:
+            return None
 
         fig = px.bar(
             hourly_avg,
@@ -972,27 +1091,24 @@ def register_callbacks(dash_app, colors):
         if not ctx.triggered:
             return dash.no_update, dash.no_update, dash.no_update
 
-        df = load_wifi_data()
-        dates = sorted(pd.to_datetime(df['timestamp']).dt.date.unique())
+        catalog = load_navigation_catalog()
 
         triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
 
+        # Step from the date currently shown in the picker
         if triggered_id == 'prev-heatmap-date':
-            new_index = (current_index - 1) % len(dates)
-            new_date = str(dates[new_index])
+            new_index, new_date = catalog.step_date(selected_date, -1)
         elif triggered_id == 'next-heatmap-date':
-            new_index = (current_index + 1) % len(dates)
-            new_date = str(dates[new_index])
+            new_index, new_date = catalog.step_date(selected_date, 1)
         elif triggered_id == 'heatmap-date-picker':
-            picked_date = pd.to_datetime(selected_date).date()
-            if picked_date in dates:
-                new_index = dates.index(picked_date)
-                new_date = str(picked_date)
-            else:
-                return dash.no_update, dash.no_update, dash.no_update
+            new_index = catalog.date_index(selected_date)
+            new_date = str(selected_date)[:10]
         else:
             return dash.no_update, dash.no_update, dash.no_update
 
+        if new_index is None:
+            return dash.no_update, dash.no_update, dash.no_update
+
         return new_date, new_index, new_date
 
 
@@ -1012,10 +1128,7 @@ def register_callbacks(dash_app, colors):
         if not selected_date:
             return current_index, dash.no_update, dash.no_update
 
-        df = load_wifi_data()
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
-        selected_date_obj = pd.to_datetime(selected_date).date()
-        run_list = sorted(df[df['date'] == selected_date_obj]['run_no'].unique())
+        run_list = load_navigation_catalog().runs(selected_date)
 
         if not run_list:
             return 0, "No runs", ''
@@ -1040,25 +1153,13 @@ def register_callbacks(dash_app, colors):
         Input('heatmap-run', 'value')
     )
     def render_heatmap(param, selected_date, selected_run):
-        df = load_wifi_data()
-        if df.empty or not selected_date or not selected_run:
+        if not selected_date or not selected_run:
             return go.Figure()
 
-        # Filter data
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
-        df = df[(df['date'] == pd.to_datetime(selected_date).date()) & 
-                (df['run_no'] == int(selected_run))]
-
-        # Aggregate per location
-        agg_df = df.groupby('location').agg({
-            'download_speed': 'mean',
-            'upload_speed': 'mean',
-            'latency_ms': 'mean',
-            'jitter_ms': 'mean',
-            'packet_loss': 'mean',
-            'rssi': 'mean',
-            'timestamp': 'count'
-        }).reset_index().rename(columns={'timestamp': 'count'})
+        # Aggregate per location for the selected date and run
+        agg_df = query_location_averages(str(pd.to_datetime(selected_date).date()), selected_run)
+        if agg_df.empty:
+            return go.Figure()
 
         # Map locations to pixel coordinates
         agg_df['x'], agg_df['y'] = zip(*agg_df['location'].map(get_pixel_coords))
@@ -1114,9 +1215,49 @@ def register_callbacks(dash_app, colors):
 
     
     # ════════════════════════════════════════════════════════════════
-    # SECTION: INSIGHTS TAB (Coming Soon)
+    # SECTION: INSIGHTS TAB
+    # Latency distribution from the per-packet ping round trip times
     # ════════════════════════════════════════════════════════════════
 
+    # 📶 Histogram of the round trip times of every echo request at a location
+    @dash_app.callback(
+        Output('insights-latency-distribution', 'figure'),
+        Output('insights-latency-summary', 'children'),
+        Input('insights-location', 'value'),
+        Input('insights-date-range', 'start_date'),
+        Input('insights-date-range', 'end_date')
+    )
+    def render_latency_distribution(location, start_date, end_date):
+        if not location:
+            return go.Figure(), ""
+
+        rtts, samples = query_latency_distribution(location, start_date, end_date)
+        received = rtts[~np.isnan(rtts)]
+        if received.size == 0:
+            return go.Figure(), f"No per-packet ping data for {location} in this range."
+
+        p50, p95, p99 = np.percentile(received, [50, 95, 99])
+        loss = 100.0 * (rtts.size - received.size) / rtts.size
+
+        fig = go.Figure(go.Histogram(x=received, nbinsx=50, marker_color=colors.get('latency_ms', 'gray')))
+        for value, label in [(p50, "p50"), (p95, "p95"), (p99, "p99")]:
+            fig.add_vline(x=value, line_dash='dash', line_color='gray',
+                          annotation_text=f"{label} {value:.1f} ms", annotation_position='top')
+        fig.update_layout(
+            title=f"📶 Round Trip Time Distribution at {location}",
+            xaxis_title="Round trip time (ms)",
+            yaxis_title="Packets",
+            plot_bgcolor='white',
+            font=dict(color=colors.get('text', 'black')),
+            height=450,
+            bargap=0.05
+        )
+
+        summary = (f"{samples} samples, {rtts.size} packets · loss {loss:.1f}% · "
+                   f"min {received.min():.1f} ms · p50 {p50:.1f} ms · p95 {p95:.1f} ms · "
+                   f"p99 {p99:.1f} ms · max {received.max():.1f} ms")
+        return fig, summary
+
     # ════════════════════════════════════════════════════════════════
     # SECTION: SHARED CALLBACKS & INTERACTIONS
     # Toggle buttons, state management, and common data handlers
@@ -1183,29 +1324,25 @@ def register_callbacks(dash_app, colors):
         if not ctx.triggered:
             return current_index, dash.no_update
 
-        df = load_wifi_data()
-        dates = sorted(pd.to_datetime(df['timestamp']).dt.date.unique())
-
-        if not dates:
-            return 0, None
+        catalog = load_navigation_catalog()
 
+        # Step from the date currently shown in the picker
         triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
         if triggered_id == 'prev-date-plot':
-            new_index = (current_index - 1) % len(dates)
-            new_date = dates[new_index]
+            new_index, new_date = catalog.step_date(selected_date, -1)
         elif triggered_id == 'next-date-plot':
-            new_index = (current_index + 1) % len(dates)
-            new_date = dates[new_index]
+            new_index, new_date = catalog.step_date(selected_date, 1)
         elif triggered_id == 'date-plot-selector':
-            picked_date = pd.to_datetime(selected_date).date()
-            if picked_date in dates:
-                new_index = dates.index(picked_date)
-                new_date = picked_date
-            else:
+            new_index = catalog.date_index(selected_date)
+            if new_index is None:
                 return current_index, selected_date
+            new_date = str(selected_date)[:10]
         else:
             return current_index, dash.no_update
 
+        if new_index is None:
+            return 0, None
+
         return new_index, new_date
 
     # 🔁 Change current run with prev/next buttons in Run Analysis
@@ -1223,10 +1360,7 @@ def register_callbacks(dash_app, colors):
         if not selected_date:
             return current_index, dash.no_update
 
-        df = load_wifi_data()
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
-        selected_date_obj = pd.to_datetime(selected_date).date()
-        run_list = sorted(df[df['date'] == selected_date_obj]['run_no'].unique())
+        run_list = load_navigation_catalog().runs(selected_date)
 
         if not run_list:
             return 0, None
@@ -1,43 +1,470 @@
 import pandas as pd
+import numpy as np
 import json
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from itertools import compress
+from threading import Lock
 from .utils import get_pixel_coords
 import os
-from Database.database import get_db_connection
+from Database.database import get_db_connection, get_data_version, MEASUREMENTS_COLLECTION
+from Database.models import METRIC_FIELDS
+from .snapshot import SNAPSHOT_DIR, load_snapshot, save_snapshot, append_delta
+from .navigation import NavigationCatalog
+from src.spool import read_spool
 
-def load_wifi_data():
+# Minimum number of seconds between two data version checks against the DB
+CACHE_CHECK_INTERVAL = 2.0
+
+# Writers stamp ingested_at just before inserting, so a document can become visible
+# slightly after one with a later stamp. Each refresh re-reads this window past the
+# watermark and drops the ids it has already loaded.
+INGEST_OVERLAP = timedelta(seconds=60)
+
+# Rows allowed in the snapshot delta log before the snapshot is rewritten
+SNAPSHOT_DELTA_LIMIT = 50000
+
+# Storage dtypes of the measurement table, kept fixed so chunks can be appended in place.
+# timestamp is int64 nanoseconds since the epoch (exposed as datetime64[ns] without a copy),
+# location holds int32 codes into the table's list of location names.
+STORAGE_DTYPES = {
+    'timestamp': 'int64',
+    'location': 'int32',
+    'run_no': 'int32',
+    **{field: 'float32' for field in METRIC_FIELDS}
+}
+
+# Columns computed from the timestamp on first use, then extended only for appended rows:
+# date as int16 day offsets from the table's first day, hour as int8
+DERIVED_DTYPES = {
+    'date': 'int16',
+    'hour': 'int8'
+}
+
+# Columns (and their order) of the frames handed out by the table
+FRAME_COLUMNS = ['timestamp', 'date', 'hour', 'location', *METRIC_FIELDS, 'run_no']
+
+# Column name -> field of a stored measurement; missing or null metrics become NaN
+RAW_FIELDS = {
+    'timestamp': 'timestamp',
+    'location': 'location',
+    'run_no': 'run_no',
+    **{field: field for field in METRIC_FIELDS}
+}
+
+HOUR_LABELS = [f"{hour:02d}:00" for hour in range(24)]
+
+NANOSECONDS_PER_DAY = 86400 * 10**9
+NANOSECONDS_PER_HOUR = 3600 * 10**9
+
+
+def _to_datetime_array(values):
+    # MongoDB hands timestamps over as epoch milliseconds ($toLong in _columnar_pipeline),
+    # which become the int64 nanoseconds of the table in one cast. Spool records hold
+    # 'YYYY-MM-DD HH:MM:SS' strings, which numpy parses without pandas. Anything else
+    # (missing values, delta logs written before timestamps came as milliseconds, malformed
+    # values) goes through pandas with coercion to NaT.
+    try:
+        return (np.array(values, dtype=np.int64) * 1_000_000).view('datetime64[ns]')
+    except (ValueError, TypeError, OverflowError):
+        pass
     try:
-        db = get_db_connection()
-        collection = db["wifi_data"]
-        records = []
-
-        for doc in collection.find():
-            location = doc["_id"]
-            measurements = doc.get(location, [])
-            for measurement in measurements:
-                try:
-                    timestamp = datetime.strptime(measurement['timestamp'], '%Y-%m-%d %H:%M:%S')
-                    records.append({
-                        'timestamp': timestamp,
-                        'date': timestamp.strftime('%Y-%m-%d'),
-                        'hour': timestamp.strftime('%H:00'),
-                        'location': measurement['location']['position[name]'],
-                        'download_speed': measurement['download_speed'],
-                        'upload_speed': measurement['upload_speed'],
-                        'latency_ms': measurement['latency_ms'],
-                        'jitter_ms': measurement['jitter_ms'],
-                        'packet_loss': measurement['packet_loss'],
-                        'rssi': measurement['rssi'],
-                        'run_no': measurement['run_no']
-                    })
-                except Exception as e:
-                    print(f"⚠️ Skipping bad record: {e}")
-                    continue
-
-        return pd.DataFrame(records)
-    except Exception as e:
-        print(f"❌ Error fetching from DB: {e}")
-        return pd.DataFrame()
+        return np.array(values, dtype='datetime64[s]').astype('datetime64[ns]')
+    except (ValueError, TypeError):
+        pass
+    series = pd.Series(values, dtype=object)
+    numeric = series.map(lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)).to_numpy(dtype=bool)
+    timestamps = pd.to_datetime(series.where(~numeric), format='mixed', errors='coerce').to_numpy(dtype='datetime64[ns]')
+    timestamps[numeric] = pd.to_datetime(series[numeric].astype('float64'), unit='ms', errors='coerce').to_numpy(dtype='datetime64[ns]')
+    return timestamps
+
+
+def _to_float_array(values):
+    try:
+        return np.array(values, dtype='float64')
+    except (ValueError, TypeError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype='float64')
+
+
+def _read_only(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+def build_measurement_columns(raw):
+    """
+    Columnar conversion of raw measurement fields into the storage columns of the table.
+    `raw` maps each RAW_FIELDS column to a list of values (one per measurement).
+    Every column is converted in one bulk call; rows whose timestamp, location or
+    run number can't be parsed are dropped through a mask. Locations stay names here;
+    the table turns them into codes when the columns are appended.
+    """
+    timestamps = _to_datetime_array(raw['timestamp'])
+    locations = np.array(raw['location'], dtype=object)
+    runs = _to_float_array(raw['run_no'])
+
+    valid = ~np.isnat(timestamps) & pd.notna(locations) & ~np.isnan(runs)
+    bad_count = len(valid) - int(valid.sum())
+    if bad_count:
+        print(f"⚠️ Skipping {bad_count} bad record(s)")
+
+    columns = {
+        'timestamp': timestamps[valid].view(np.int64),
+        'location': locations[valid],
+        'run_no': runs[valid].astype(np.int32)
+    }
+    for field in METRIC_FIELDS:
+        columns[field] = _to_float_array(raw[field])[valid].astype(np.float32)
+    return columns
+
+
+def build_measurement_frame(raw):
+    table = MeasurementTable()
+    table.append(build_measurement_columns(raw))
+    return table.frame()
+
+
+def _columnar_pipeline(match):
+    # Group the matching measurements into per-(location, date) buckets holding one
+    # array per field, so the loader receives columns instead of documents.
+    # $ifNull keeps the arrays aligned when a measurement lacks a field. Timestamps come
+    # as epoch milliseconds, so the loader never converts datetime objects one by one.
+    fields = {'sample_id': '_id', 'ingested_at': 'ingested_at', **RAW_FIELDS}
+    values = {column: f"${path}" for column, path in fields.items()}
+    values['timestamp'] = {"$toLong": "$timestamp"}
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"location": "$location", "date": "$date"},
+            **{column: {"$push": {"$ifNull": [value, None]}} for column, value in values.items()}
+        }}
+    ]
+
+
+def fetch_new_measurements(watermark=None):
+    """
+    Fetch raw measurement columns from the measurements collection.
+    `watermark` is the state returned by the previous call: only measurements ingested
+    since then are pulled from MongoDB. Returns (raw columns, new watermark).
+    """
+    db = get_db_connection()
+    collection = db[MEASUREMENTS_COLLECTION]
+    mark = watermark["ingested_at"] if watermark else None
+    recent = dict(watermark["recent"]) if watermark else {}
+
+    match = {"ingested_at": {"$gt": mark - INGEST_OVERLAP}} if mark else {}
+    raw = {column: [] for column in ['sample_id', 'ingested_at', *RAW_FIELDS]}
+    for bucket in collection.aggregate(_columnar_pipeline(match), allowDiskUse=True):
+        for column in raw:
+            raw[column].extend(bucket[column])
+
+    # Drop measurements already loaded by a previous refresh (overlap window)
+    if recent:
+        keep = [sample_id not in recent for sample_id in raw['sample_id']]
+        raw = {column: list(compress(values, keep)) for column, values in raw.items()}
+
+    ingested = [stamp for stamp in raw['ingested_at'] if stamp is not None]
+    if ingested:
+        mark = max([mark, *ingested] if mark else ingested)
+    recent.update(zip(raw['sample_id'], raw['ingested_at']))
+    if mark:
+        recent = {
+            sample_id: stamp for sample_id, stamp in recent.items()
+            if stamp is not None and stamp > mark - INGEST_OVERLAP
+        }
+
+    return raw, {"ingested_at": mark, "recent": recent}
+
+
+# Function to read the raw measurement columns from the collector's local spool (src/spool.py).
+# Used when neither MongoDB nor a snapshot is available; samples are de-duplicated by id.
+def read_spool_measurements(directory=None):
+    raw = {column: [] for column in RAW_FIELDS}
+    seen = set()
+    for record in read_spool(directory):
+        sample_id = record.get('_id')
+        if sample_id is not None:
+            if sample_id in seen:
+                continue
+            seen.add(sample_id)
+        for column, field in RAW_FIELDS.items():
+            raw[column].append(record.get(field))
+    return raw
+
+
+def fetch_wifi_data(watermark=None):
+    raw, watermark = fetch_new_measurements(watermark)
+    return build_measurement_frame(raw), watermark
+
+
+def _grow(buffer, size, needed, dtype):
+    # Return a buffer holding at least `needed` rows, keeping the first `size` ones
+    if buffer is not None and len(buffer) >= needed:
+        return buffer
+    grown = np.empty(max(2 * needed, 1024), dtype=dtype)
+    if buffer is not None:
+        grown[:size] = buffer[:size]
+    return grown
+
+
+class MeasurementTable:
+    """
+    Append-only, compact columnar storage for the measurement table.
+    Each column lives in a numpy buffer with spare capacity (doubled when full), so
+    appending a chunk only copies the new rows. Metrics are float32, run numbers int32,
+    timestamps int64 epoch nanoseconds and locations int32 codes into `locations`.
+
+    frame() hands the columns out as a DataFrame without copying the large buffers:
+    location, date and hour come out as Categoricals. date and hour are derived from
+    the timestamps the first time they are asked for and extended incrementally after.
+
+    `catalog` (modules/navigation.py) indexes the dates, runs and locations of the rows
+    and is updated with every append.
+    """
+
+    def __init__(self, columns=None, locations=None):
+        # Initial columns (e.g. memory-mapped snapshot arrays) are used as they are;
+        # they are copied into growable buffers on the first append
+        self._columns = dict(columns or {})
+        self._size = len(self._columns['timestamp']) if self._columns else 0
+        self.locations = list(locations or [])
+        self._location_codes = {name: code for code, name in enumerate(self.locations)}
+        self._derived = {}
+        self._derived_size = 0
+        self._first_day = None
+        self.catalog = NavigationCatalog()
+        self._index_rows(0)
+
+    def __len__(self):
+        return self._size
+
+    def _encode_locations(self, names):
+        # Fetch and spool reads hand over plain lists, which pandas no longer factorizes
+        codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+        mapping = np.empty(len(uniques), dtype=np.int32)
+        for index, name in enumerate(uniques):
+            if name not in self._location_codes:
+                self._location_codes[name] = len(self.locations)
+                self.locations.append(name)
+            mapping[index] = self._location_codes[name]
+        return mapping[codes]
+
+    def append(self, columns):
+        count = len(columns['timestamp'])
+        if count == 0:
+            return
+        columns = dict(columns, location=self._encode_locations(columns['location']))
+        needed = self._size + count
+        for name, dtype in STORAGE_DTYPES.items():
+            buffer = _grow(self._columns.get(name), self._size, needed, dtype)
+            buffer[self._size:needed] = columns[name]
+            self._columns[name] = buffer
+        start, self._size = self._size, needed
+        self._index_rows(start)
+
+    def _index_rows(self, start):
+        if self._size > start:
+            self.catalog.add(
+                self._columns['timestamp'][start:self._size], self._columns['run_no'][start:self._size],
+                self._columns['location'][start:self._size], self.locations
+            )
+
+    def storage_columns(self):
+        return {name: buffer[:self._size] for name, buffer in self._columns.items()}
+
+    def _update_derived(self):
+        start, end = self._derived_size, self._size
+        if start == end:
+            return
+        timestamps = self._columns['timestamp'][start:end]
+        days = timestamps // NANOSECONDS_PER_DAY
+        first_day = int(days.min())
+        if self._first_day is None:
+            self._first_day = first_day
+        elif first_day < self._first_day:
+            # Late-arriving older data: shift the existing day offsets
+            self._derived['date'][:start] += self._first_day - first_day
+            self._first_day = first_day
+        values = {
+            'date': days - self._first_day,
+            'hour': (timestamps - days * NANOSECONDS_PER_DAY) // NANOSECONDS_PER_HOUR
+        }
+        for name, dtype in DERIVED_DTYPES.items():
+            buffer = _grow(self._derived.get(name), start, end, dtype)
+            buffer[start:end] = values[name]
+            self._derived[name] = buffer
+        self._derived_size = end
+
+    def _date_labels(self):
+        dates = self._derived['date'][:self._size]
+        last_offset = int(dates.max()) if len(dates) else 0
+        days = np.arange(self._first_day, self._first_day + last_offset + 1).astype('datetime64[D]')
+        return np.datetime_as_string(days).tolist()
+
+    def frame(self, columns=None):
+        """
+        Read-only DataFrame over the table. Pass `columns` to build only the columns a caller
+        needs, e.g. frame(['location', 'timestamp']) never derives the date/hour columns.
+        The columns are views of the table's buffers marked read-only, so an in-place write
+        (df.loc[0, 'rssi'] = ...) raises instead of changing the cache for every later caller
+        (categorical columns copy their codes first); adding or replacing columns is fine.
+        """
+        if not self._columns:
+            return pd.DataFrame(columns=columns or FRAME_COLUMNS)
+        columns = columns or FRAME_COLUMNS
+        size = self._size
+        if any(name in DERIVED_DTYPES for name in columns):
+            self._update_derived()
+
+        data = {}
+        for name in columns:
+            if name == 'timestamp':
+                data[name] = _read_only(self._columns['timestamp'][:size].view('datetime64[ns]'))
+            elif name == 'location':
+                data[name] = pd.Categorical.from_codes(_read_only(self._columns['location'][:size]), categories=self.locations, validate=False)
+            elif name == 'date':
+                data[name] = pd.Categorical.from_codes(_read_only(self._derived['date'][:size]), categories=self._date_labels(), validate=False)
+            elif name == 'hour':
+                data[name] = pd.Categorical.from_codes(_read_only(self._derived['hour'][:size]), categories=HOUR_LABELS, validate=False)
+            else:
+                data[name] = _read_only(self._columns[name][:size])
+        return pd.DataFrame(data, copy=False)
+
+
+class WifiDataCache:
+    """
+    Process-wide cache of the measurements.
+    The table is loaded once and then kept up to date incrementally: when the data
+    version in the DB changes, only measurements ingested since the last refresh are
+    fetched and appended. A new epoch (data deleted or rewritten) triggers a full reload.
+    Callers get a fresh, read-only DataFrame over the cached columns: adding or replacing
+    columns never leaks back into the cache, and writing into a cell raises.
+
+    The table is also persisted as an on-disk snapshot plus delta log (modules/snapshot.py).
+    A fresh process memory-maps the snapshot and only catches up the tail from MongoDB.
+    """
+
+    def __init__(self, check_interval=CACHE_CHECK_INTERVAL, snapshot_dir=SNAPSHOT_DIR):
+        self.check_interval = check_interval
+        self.snapshot_dir = snapshot_dir
+        self._lock = Lock()
+        self._table = None
+        self._watermark = None
+        self._version = None
+        self._epoch = None
+        self._checked_at = 0.0
+        self._generation = None
+        self._delta_rows = 0
+
+    def get(self):
+        with self._lock:
+            self._refresh_if_due()
+            # frame() may extend the lazily derived columns, so it runs under the lock too
+            return self._table.frame() if self._table is not None else pd.DataFrame()
+
+    # Function to get the navigation catalog of the cached table, without building a frame
+    def catalog(self):
+        with self._lock:
+            self._refresh_if_due()
+            return self._table.catalog if self._table is not None else NavigationCatalog()
+
+    def _refresh_if_due(self):
+        now = time.monotonic()
+        if self._table is None or now - self._checked_at >= self.check_interval:
+            self._refresh()
+            self._checked_at = now
+
+    def invalidate(self):
+        with self._lock:
+            self._table = None
+            self._watermark = None
+            self._version = None
+            self._epoch = None
+
+    def _refresh(self):
+        if self._table is None and self.snapshot_dir:
+            self._load_snapshot()
+        try:
+            version, epoch = get_data_version(get_db_connection())
+            if self._table is not None and version == self._version:
+                return
+            full_reload = self._table is None or epoch != self._epoch
+            if full_reload:
+                table, watermark = MeasurementTable(), None
+            else:
+                table, watermark = self._table, self._watermark
+            raw, watermark = fetch_new_measurements(watermark)
+            new_rows = build_measurement_columns(raw)
+            table.append(new_rows)
+            self._table, self._watermark = table, watermark
+            self._version, self._epoch = version, epoch
+        except Exception as e:
+            # Keep serving the last good table (or the snapshot) if the DB is unreachable
+            print(f"❌ Error fetching from DB: {e}")
+            if self._table is None:
+                self._load_spool()
+            return
+        # An empty table has no columns yet: there is nothing to snapshot
+        if self.snapshot_dir and len(self._table):
+            self._persist(raw, len(new_rows['timestamp']), full_reload)
+
+    def _load_snapshot(self):
+        try:
+            snapshot = load_snapshot(self.snapshot_dir)
+            if snapshot is None:
+                return
+            manifest, columns, delta_raw, watermark = snapshot
+            table = MeasurementTable(columns, locations=manifest["locations"])
+            if delta_raw:
+                table.append(build_measurement_columns(delta_raw))
+            self._table, self._watermark = table, watermark
+            self._epoch, self._generation = manifest["epoch"], manifest["generation"]
+            self._delta_rows = len(table) - manifest["rows"]
+            print(f"✅ Loaded snapshot with {len(table)} measurements")
+        except Exception as e:
+            print(f"⚠️ Could not load snapshot: {e}")
+
+    def _load_spool(self):
+        # Last resort: the collector's local spool. The version and epoch stay unknown,
+        # so the table is replaced by a full load once MongoDB is reachable again.
+        try:
+            raw = read_spool_measurements()
+            if raw['timestamp']:
+                table = MeasurementTable()
+                table.append(build_measurement_columns(raw))
+                self._table = table
+                print(f"⚠️ Serving {len(table)} measurements from the local spool")
+        except Exception as e:
+            print(f"⚠️ Could not read the spool: {e}")
+
+    def _persist(self, raw, new_count, full_reload):
+        try:
+            if full_reload or self._delta_rows + new_count > SNAPSHOT_DELTA_LIMIT:
+                self._generation = save_snapshot(
+                    self._table.storage_columns(), self._table.locations,
+                    self._epoch, self._watermark, self.snapshot_dir
+                )
+                self._delta_rows = 0
+            elif new_count and append_delta(raw, self._watermark, self._generation, self.snapshot_dir):
+                self._delta_rows += new_count
+        except Exception as e:
+            print(f"⚠️ Could not write snapshot: {e}")
+
+
+wifi_data_cache = WifiDataCache()
+
+
+def load_wifi_data():
+    return wifi_data_cache.get()
+
+
+def load_navigation_catalog():
+    return wifi_data_cache.catalog()
+
+
+def invalidate_wifi_data_cache():
+    wifi_data_cache.invalidate()
 
 
 def prepare_heatmap_data(df, selected_param):
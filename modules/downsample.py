@@ -0,0 +1,75 @@
+import numpy as np
+
+# Downsampling for long time series, so a chart never carries more points than it can draw.
+#
+#   lttb()            - Largest-Triangle-Three-Buckets: keeps the points that preserve the visual shape
+#   minmax_buckets()  - keeps the lowest and highest point of every bucket, so no spike is lost
+#
+# Both return indices into the input arrays (sorted), so any other per-point column can follow along.
+
+# Points drawn per trace when the chart width is unknown
+DEFAULT_MAX_POINTS = 500
+
+# Horizontal pixels per point and the limits applied to a width-based budget
+PIXELS_PER_POINT = 3
+MIN_POINTS = 100
+MAX_POINTS = 2000
+
+
+# Function to turn a chart width in pixels into a point budget per trace
+def points_for_width(width_px):
+    if not width_px:
+        return DEFAULT_MAX_POINTS
+    return int(min(MAX_POINTS, max(MIN_POINTS, width_px // PIXELS_PER_POINT)))
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    x must be increasing; NaN values in y are skipped. Returns the indices of the kept points.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if threshold >= len(valid) or threshold < 3:
+        return valid
+
+    vx, vy = x[valid], y[valid]
+    # First and last points are always kept; the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, len(valid) - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, len(valid) - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (or the last point) is the third corner of the triangle
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else len(valid)
+        avg_x, avg_y = vx[next_start:next_end].mean(), vy[next_start:next_end].mean()
+
+        areas = np.abs(
+            (vx[previous] - avg_x) * (vy[start:end] - vy[previous])
+            - (vx[previous] - vx[start:end]) * (avg_y - vy[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+
+    return valid[kept]
+
+
+def minmax_buckets(y, buckets):
+    """
+    Min/max bucketing: split the series into equal-count buckets and keep each bucket's
+    lowest and highest point. NaN values are skipped. Returns the sorted indices of the kept points.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if 2 * buckets >= len(valid) or buckets < 1:
+        return valid
+
+    kept = []
+    for chunk in np.array_split(valid, buckets):
+        values = y[chunk]
+        kept.append(chunk[np.argmin(values)])
+        kept.append(chunk[np.argmax(values)])
+    return np.unique(np.array(kept, dtype=np.int64))
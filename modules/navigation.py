@@ -0,0 +1,109 @@
+import bisect
+from threading import Lock
+import numpy as np
+import pandas as pd
+
+NANOSECONDS_PER_DAY = 86400 * 10**9
+
+
+# Function to normalise a date coming from a picker or dropdown ('2025-04-05', '2025-04-05T00:00:00', date)
+def date_key(value):
+    return str(value)[:10] if value else None
+
+
+class NavigationCatalog:
+    """
+    Small sorted index of what has been measured, used by the date/run/location controls:
+    the sorted dates, the runs of every date, the locations of every run and the
+    first/last timestamp of every run.
+
+    It is fed the chunks appended to the measurement table (see WifiDataCache), so
+    answering a lookup never touches the table. Lookups and prev/next steps are bisect
+    searches over the sorted lists.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._dates = []        # sorted 'YYYY-MM-DD'
+        self._runs = {}         # date -> sorted run numbers
+        self._locations = {}    # (date, run) -> sorted location names
+        self._spans = {}        # (date, run) -> [first, last] timestamp in epoch nanoseconds
+
+    def add(self, timestamps, runs, location_codes, location_names):
+        """
+        Fold a chunk of rows into the catalog. timestamps are epoch nanoseconds,
+        location_codes index into location_names. The chunk is grouped per
+        (day, run, location) first, so the Python loop only sees distinct combinations.
+        """
+        if len(timestamps) == 0:
+            return
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        chunk = pd.DataFrame({
+            'day': timestamps // NANOSECONDS_PER_DAY,
+            'run': np.asarray(runs),
+            'location': np.asarray(location_codes),
+            'timestamp': timestamps
+        })
+        grouped = chunk.groupby(['day', 'run', 'location'], sort=False)['timestamp'].agg(['min', 'max'])
+
+        with self._lock:
+            for (day, run, code), first, last in zip(grouped.index, grouped['min'], grouped['max']):
+                date, run = str(np.datetime64(int(day), 'D')), int(run)
+                if date not in self._runs:
+                    bisect.insort(self._dates, date)
+                    self._runs[date] = []
+                key = (date, run)
+                if key not in self._spans:
+                    bisect.insort(self._runs[date], run)
+                    self._locations[key] = []
+                    self._spans[key] = [int(first), int(last)]
+                else:
+                    span = self._spans[key]
+                    span[0], span[1] = min(span[0], int(first)), max(span[1], int(last))
+                _insert_unique(self._locations[key], location_names[code])
+
+    def dates(self):
+        with self._lock:
+            return list(self._dates)
+
+    def runs(self, date):
+        with self._lock:
+            return list(self._runs.get(date_key(date), []))
+
+    def locations(self, date, run_no):
+        with self._lock:
+            return list(self._locations.get((date_key(date), int(run_no)), []))
+
+    # Function to get the (first, last) timestamps of a run, or None when the run is unknown
+    def span(self, date, run_no):
+        with self._lock:
+            span = self._spans.get((date_key(date), int(run_no)))
+        return (pd.Timestamp(span[0]), pd.Timestamp(span[1])) if span else None
+
+    # Function to get the position of a date in the sorted dates, or None when it has no data
+    def date_index(self, date):
+        date = date_key(date)
+        with self._lock:
+            index = bisect.bisect_left(self._dates, date)
+            return index if index < len(self._dates) and self._dates[index] == date else None
+
+    # Function to step from a date to the previous (step=-1) or next (step=1) date with data,
+    # wrapping around at either end. A date without data steps from where it would be inserted.
+    def step_date(self, date, step):
+        date = date_key(date)
+        with self._lock:
+            if not self._dates:
+                return None, None
+            if date is None:
+                index = 0 if step > 0 else len(self._dates) - 1
+            elif step > 0:
+                index = bisect.bisect_right(self._dates, date) % len(self._dates)
+            else:
+                index = (bisect.bisect_left(self._dates, date) - 1) % len(self._dates)
+            return index, self._dates[index]
+
+
+def _insert_unique(sorted_values, value):
+    index = bisect.bisect_left(sorted_values, value)
+    if index == len(sorted_values) or sorted_values[index] != value:
+        sorted_values.insert(index, value)
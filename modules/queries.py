@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from Database.database import get_db_connection, MEASUREMENTS_COLLECTION
+from Database.models import METRIC_FIELDS, decode_rtts
+
+# Query layer for the dashboard: filters and group-bys run inside MongoDB as
+# aggregation pipelines, so only the aggregated rows each figure needs are fetched.
+# Averages and bounds come from the rollup collections (see Database/rollups.py),
+# which are maintained on write, so their cost does not grow with the raw history.
+
+
+def _date_range_match(start_date=None, end_date=None):
+    # Dates are stored as 'YYYY-MM-DD' strings, so a date range is a string range
+    condition = {}
+    if start_date:
+        condition["$gte"] = str(start_date)
+    if end_date:
+        condition["$lte"] = str(end_date)
+    return {"date": condition} if condition else {}
+
+
+def _mean(field):
+    # Mean of a metric from the running sums of a rollup document (null when it has no values)
+    n, total = f"$stats.{field}.n", f"$stats.{field}.sum"
+    return {"$cond": [{"$gt": [n, 0]}, {"$divide": [total, n]}, None]}
+
+
+def _run_pipeline(pipeline, collection=MEASUREMENTS_COLLECTION):
+    try:
+        db = get_db_connection()
+        return list(db[collection].aggregate(pipeline))
+    except Exception as e:
+        print(f"❌ Error querying DB: {e}")
+        return []
+
+
+# Function to get per-location averages of every metric for one date and run (Heatmap)
+def query_location_averages(date, run_no):
+    # rollup_runs already holds exactly one document per (location, date, run)
+    pipeline = [
+        {"$match": {"date": str(date), "run_no": int(run_no)}},
+        {"$project": {"_id": 0, "location": 1, **{field: _mean(field) for field in METRIC_FIELDS}, "count": 1}}
+    ]
+    rows = _run_pipeline(pipeline, "rollup_runs")
+    return pd.DataFrame(rows, columns=['location'] + METRIC_FIELDS + ['count'])
+
+
+# Function to get the hourly averages of the given parameters at one location
+def query_hourly_averages(location, parameters):
+    if isinstance(parameters, str):
+        parameters = [parameters]
+    pipeline = [
+        {"$match": {"location": location}},
+        {"$project": {"_id": 0, "hour": 1, **{param: _mean(param) for param in parameters}}},
+        {"$sort": {"hour": 1}}
+    ]
+    rows = _run_pipeline(pipeline, "rollup_hourly")
+    return pd.DataFrame(
+        [{"hour": f"{row['hour']:02d}:00", **{param: row.get(param) for param in parameters}} for row in rows],
+        columns=['hour'] + parameters
+    )
+
+
+# Function to get everything the Trends chart needs in one round trip:
+#   runs      - every (date, run_no) in the date range, across all locations, with the time it started
+#   averages  - per-run averages of the parameters at the selected location
+#   bounds    - global min/max of each parameter, used for normalisation
+def query_run_trends(location, parameters, start_date=None, end_date=None):
+    run_key = {"date": "$date", "run_no": "$run_no"}
+    in_range = _date_range_match(start_date, end_date)
+    pipeline = [
+        {"$facet": {
+            "runs": [
+                {"$match": in_range},
+                {"$group": {"_id": run_key, "timestamp": {"$min": "$first_timestamp"}}}
+            ],
+            "averages": [
+                {"$match": {**in_range, "location": location}},
+                {"$project": {"_id": run_key, **{param: _mean(param) for param in parameters}}}
+            ]
+        }}
+    ]
+    result = (_run_pipeline(pipeline, "rollup_runs") or [{}])[0]
+
+    # Global bounds from the per-day rollups: far fewer documents than runs
+    bounds_pipeline = [
+        {"$group": {
+            "_id": None,
+            **{f"{param}_min": {"$min": f"$stats.{param}.min"} for param in parameters},
+            **{f"{param}_max": {"$max": f"$stats.{param}.max"} for param in parameters}
+        }}
+    ]
+    bounds_row = (_run_pipeline(bounds_pipeline, "rollup_daily") or [{}])[0]
+
+    runs = pd.DataFrame(
+        [{**row["_id"], "timestamp": row.get("timestamp")} for row in result.get("runs", [])],
+        columns=['date', 'run_no', 'timestamp']
+    )
+    # Rollups written before first_timestamp existed fall back to the start of the day
+    runs['timestamp'] = pd.to_datetime(runs['timestamp']).fillna(pd.to_datetime(runs['date']))
+    averages = pd.DataFrame(
+        [{**row["_id"], **{param: row.get(param) for param in parameters}} for row in result.get("averages", [])],
+        columns=['date', 'run_no'] + parameters
+    )
+    bounds = {param: (bounds_row.get(f"{param}_min"), bounds_row.get(f"{param}_max")) for param in parameters}
+    return runs, averages, bounds
+
+
+# Function to get the first measurement of a run at one location (Run Analysis)
+def query_run_measurement(location, date, run_no):
+    pipeline = [
+        {"$match": {"location": location, "date": str(date), "run_no": int(run_no)}},
+        {"$sort": {"timestamp": 1}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "timestamp": 1, **{field: 1 for field in METRIC_FIELDS}}}
+    ]
+    rows = _run_pipeline(pipeline)
+    return rows[0] if rows else None
+
+
+# Function to get the per-packet round trip times of the latest samples at one location (Insights).
+# Returns a float array in ms with NaN for lost packets, and the number of samples it came from.
+def query_latency_distribution(location, start_date=None, end_date=None, max_samples=500):
+    # Filter on timestamp rather than date, so the (location, timestamp) index serves match and sort
+    timestamp = {}
+    if start_date:
+        timestamp["$gte"] = datetime.strptime(str(start_date)[:10], '%Y-%m-%d')
+    if end_date:
+        timestamp["$lt"] = datetime.strptime(str(end_date)[:10], '%Y-%m-%d') + timedelta(days=1)
+    match = {"location": location, "rtts": {"$exists": True}}
+    if timestamp:
+        match["timestamp"] = timestamp
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": max_samples},
+        {"$project": {"_id": 0, "rtts": 1}}
+    ]
+    rows = _run_pipeline(pipeline)
+    rtts = [rtt for row in rows for rtt in decode_rtts(row["rtts"])]
+    return np.array(rtts, dtype=float), len(rows)
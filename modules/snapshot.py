@@ -0,0 +1,172 @@
+import json
+import os
+import glob
+import time
+from uuid import uuid4
+from datetime import datetime
+import numpy as np
+from Database.models import METRIC_FIELDS
+
+# On-disk snapshot of the measurement table, so the dashboard can start without
+# re-reading the whole history from MongoDB.
+#
+#   data/snapshot/manifest.json       - generation, row count, epoch, watermark, location names
+#   data/snapshot/<column>.<gen>.npy  - one plain NumPy file per storage column of the table
+#                                       (int64 epoch timestamps, int32 location codes, float32
+#                                       metrics, ...), memory-mapped on load
+#   data/snapshot/delta.<gen>.jsonl   - measurements loaded after the snapshot was written
+#
+# The manifest is replaced last and atomically, so a reader always sees a complete generation.
+# Every write gets a generation id of its own: web workers reloading at the same time each
+# write a complete set of files, and whichever manifest lands last points at one whole set,
+# never at location codes of one worker and location names of another.
+
+SNAPSHOT_DIR = "data/snapshot"
+SNAPSHOT_FORMAT = 2
+
+# Seconds a file of a generation the manifest doesn't point at is kept; younger ones may
+# still be written by another process that is about to replace the manifest
+STALE_GENERATION_SECONDS = 300
+
+# Columns written as .npy files; location holds codes into manifest["locations"]
+STORED_COLUMNS = ['timestamp', 'location', 'run_no', *METRIC_FIELDS]
+
+
+def _path(directory, name, generation, extension="npy"):
+    return os.path.join(directory, f"{name}.{generation}.{extension}")
+
+
+def _encode_watermark(watermark):
+    if not watermark or not watermark.get("ingested_at"):
+        return None
+    return {
+        "ingested_at": watermark["ingested_at"].isoformat(),
+        "recent": {sample_id: stamp.isoformat() for sample_id, stamp in watermark["recent"].items()}
+    }
+
+
+def _decode_watermark(data):
+    if not data:
+        return None
+    return {
+        "ingested_at": datetime.fromisoformat(data["ingested_at"]),
+        "recent": {sample_id: datetime.fromisoformat(stamp) for sample_id, stamp in data["recent"].items()}
+    }
+
+
+def _merge_watermarks(current, new):
+    if not new:
+        return current
+    if not current:
+        return new
+    return {
+        "ingested_at": max(current["ingested_at"], new["ingested_at"]),
+        "recent": {**current["recent"], **new["recent"]}
+    }
+
+
+def read_manifest(directory=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        return manifest if manifest.get("format") == SNAPSHOT_FORMAT else None
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+# Function to write the storage columns of the table as a new snapshot generation
+def save_snapshot(columns, locations, epoch, watermark, directory=SNAPSHOT_DIR):
+    os.makedirs(directory, exist_ok=True)
+    previous = (read_manifest(directory) or {}).get("generation")
+    generation = f"{int(time.time())}-{os.getpid()}-{uuid4().hex[:8]}"
+
+    for column in STORED_COLUMNS:
+        path = _path(directory, column, generation)
+        # np.save adds .npy to names without it, so the temporary name keeps the extension
+        tmp_path = f"{path[:-len('.npy')]}.tmp.npy"
+        np.save(tmp_path, np.asarray(columns[column]))
+        os.replace(tmp_path, path)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "generation": generation,
+        "rows": len(columns['timestamp']),
+        "epoch": epoch,
+        "watermark": _encode_watermark(watermark),
+        "locations": [str(location) for location in locations],
+        "written_at": datetime.now().isoformat()
+    }
+    tmp_path = os.path.join(directory, f"manifest.json.{generation}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(directory, "manifest.json"))
+
+    # Generations the manifest no longer points at: the one it pointed at before right away
+    # (it was complete when published), others once no process can still be writing them
+    current = (read_manifest(directory) or {}).get("generation")
+    cutoff = time.time() - STALE_GENERATION_SECONDS
+    for path in glob.glob(os.path.join(directory, "*.npy")) + glob.glob(os.path.join(directory, "delta.*.jsonl")):
+        name = os.path.basename(path)
+        if f".{current}." in name:
+            continue
+        try:
+            if f".{previous}." in name or os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+    return generation
+
+
+# Function to append newly loaded raw measurements to the delta log of a snapshot generation
+def append_delta(raw, watermark, generation, directory=SNAPSHOT_DIR):
+    manifest = read_manifest(directory)
+    if not manifest or manifest["generation"] != generation:
+        # Another process wrote a newer snapshot; our rows are caught up from MongoDB on boot
+        return False
+    line = json.dumps({"watermark": _encode_watermark(watermark), "raw": raw}, default=lambda value: value.isoformat())
+    with open(_path(directory, "delta", generation, "jsonl"), "a") as f:
+        f.write(line + "\n")
+    return True
+
+
+def load_snapshot(directory=SNAPSHOT_DIR):
+    """
+    Load the current snapshot generation.
+    Returns (manifest, columns, delta_raw, watermark) or None when there is no usable snapshot.
+    Columns are memory-mapped read-only; location codes index into manifest["locations"].
+    delta_raw holds the raw measurement columns from the delta log, de-duplicated by sample id.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    generation = manifest["generation"]
+    try:
+        columns = {
+            column: np.load(_path(directory, column, generation), mmap_mode='r')
+            for column in STORED_COLUMNS
+        }
+    except (FileNotFoundError, ValueError) as e:
+        print(f"⚠️ Ignoring incomplete snapshot: {e}")
+        return None
+
+    watermark = _decode_watermark(manifest["watermark"])
+    delta_raw, seen = None, set(watermark["recent"]) if watermark else set()
+    try:
+        with open(_path(directory, "delta", generation, "jsonl")) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn last line from a crash
+                raw = entry["raw"]
+                keep = [sample_id not in seen for sample_id in raw["sample_id"]]
+                seen.update(raw["sample_id"])
+                if delta_raw is None:
+                    delta_raw = {column: [] for column in raw}
+                for column, values in raw.items():
+                    delta_raw[column].extend(value for value, flag in zip(values, keep) if flag)
+                watermark = _merge_watermarks(watermark, _decode_watermark(entry["watermark"]))
+    except FileNotFoundError:
+        pass
+
+    return manifest, columns, delta_raw, watermark
@@ -0,0 +1,128 @@
+import sys
+import time
+import signal
+import argparse
+from Database.database import register_shutdown_hook
+from src.config import DAEMON_CONFIG
+from src.control import (read_control, read_jobs, report_state, report_job, complete_job,
+                         collector_alive, process_name)
+from src.jobs import JobManager
+from src.main import get_writer
+from src.timings import get_timings
+
+# Standalone collector process: python -m src.collector
+#
+# Probes run here instead of inside the web server, so a long speed test never competes
+# with dashboard callbacks, and the web app can run with any number of workers. The web app
+# only writes start/stop requests into the job documents (src/control.py); this process
+# polls them, runs every requested job (src/jobs.py) on threads of its own and reports
+# their state and progress, plus a heartbeat carrying the stage timings (src/timings.py).
+
+
+class CollectorDaemon:
+
+    def __init__(self, config=None):
+        self.config = {**DAEMON_CONFIG, **(config or {})}
+        self.name = process_name()
+        self.jobs = JobManager()
+        self._finished = {}          # job name -> command_id of its last finished run
+        self._reported = {}          # job name -> state last written to its document
+        self._last_report = 0.0
+
+    def run(self):
+        control = read_control()
+        owner = control.get("owner")
+        if collector_alive(control) and owner not in (None, self.name):
+            print(f"❌ Another collector ({owner}) is already running")
+            return False
+        self._call(report_state, state="running", owner=self.name, message="Collector ready")
+        print(f"✅ Collector {self.name} waiting for requests")
+        try:
+            while True:
+                self._poll()
+                time.sleep(self.config["poll_interval"])
+        except (KeyboardInterrupt, SystemExit):
+            print("Collector shutting down...")
+        finally:
+            self._shutdown()
+        return True
+
+    def _poll(self):
+        try:
+            requests = {job["_id"]: job for job in read_jobs()}
+        except Exception as e:
+            print(f"⚠️ Could not read the job requests: {e}")
+            return
+
+        heartbeat_due = time.monotonic() - self._last_report >= self.config["heartbeat_interval"]
+        for name, request in requests.items():
+            job = self.jobs.get(name)
+            running = job is not None and job.is_running()
+            if job is not None and not running and self._finished.get(name) != job.command_id:
+                # The job ended by itself (a one-pass run) or after a stop request
+                self._finished[name] = job.command_id
+                if job.mode == "run" and job.state == "finished":
+                    self._call(complete_job, name, job.command_id)
+
+            command_id = request.get("command_id")
+            started = False
+            if (request.get("desired") == "running" and not running
+                    and command_id and command_id != self._finished.get(name)):
+                # _start() reports a job that fails to start itself
+                started = True
+                job = self._start(name, request)
+            elif request.get("desired") == "stopped" and running:
+                self.jobs.stop(name)
+
+            if job is not None and (heartbeat_due or self._reported.get(name) != job.state):
+                self._report(job)
+            elif job is None and not started and request.get("state") in ("running", "stopping"):
+                # Left behind by a collector that died without reporting
+                self._call(report_job, name, state="interrupted")
+        if heartbeat_due:
+            self._last_report = time.monotonic()
+            self._call(report_state, state="running", owner=self.name, timings=get_timings().snapshot())
+
+    def _start(self, name, request):
+        locations = request.get("locations") or self.config["locations"]
+        try:
+            return self.jobs.start(name, locations, request.get("mode", "run"),
+                                   request.get("schedule"), request.get("command_id"))
+        except Exception as e:
+            print(f"❌ [Job {name}] could not start: {e}")
+            self._finished[name] = request.get("command_id")
+            self._call(report_job, name, state="failed", error=str(e))
+            return None
+
+    def _report(self, job):
+        self._reported[job.name] = job.state
+        self._call(report_job, job.name, state=job.state, progress=job.progress(), error=job.error)
+
+    def _shutdown(self):
+        running = [job for job in self.jobs.list() if job.is_running()]
+        self.jobs.stop_all(timeout=self.config["stop_timeout"])
+        get_writer().flush()
+        # Interrupted jobs keep desired = "running", so the next collector resumes them
+        for job in running:
+            self._call(report_job, job.name, state="interrupted", progress=job.progress(), error=job.error)
+        self._call(report_state, state="offline", owner=None, message="Collector exited")
+
+    @staticmethod
+    def _call(function, *args, **kwargs):
+        try:
+            function(*args, **kwargs)
+        except Exception as e:
+            print(f"⚠️ Could not update the control documents: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collector process running the jobs requested from the web app")
+    parser.parse_args()
+    register_shutdown_hook()
+    # systemd/docker stop with SIGTERM: finish like on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    return 0 if CollectorDaemon().run() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+COLLECTOR_CONFIG = {
+    # Locations probed at the same time within a run; 1 probes them one after another.
+    # Probes started on the same machine share its uplink, so only ping and RSSI run in
+    # parallel: one speed test runs at a time per collector process, across all jobs, and
+    # the others wait for it.
+    "max_workers": 5,
+
+    # Seconds to wait between two locations when probing one after another
+    "pause_seconds": 5,
+
+    # Seconds after which a probe is abandoned and its values are recorded as missing
+    "probe_timeouts": {
+        "speedtest": 120,
+        "ping": 30,
+        "rssi": 10
+    },
+
+    # The probes of a sample run at the same time. Probes listed here ("ping", "rssi")
+    # wait for the speed test to finish instead, e.g. because ping times rise while the
+    # speed test saturates the link.
+    "serialize_with_speedtest": [],
+
+    # How RSSI and ping are measured (see src/probes.py): "windows", "linux", "fake",
+    # or "auto" for the backend of the current platform
+    "probe_backend": "auto",
+
+    # Echo requests sent per sample, and the seconds between / allowed for each of them
+    "ping_host": "8.8.8.8",
+    "ping_count": 10,
+    "ping_interval": 1.0,
+    "ping_packet_timeout": 1.0,
+
+    # Throughput probe: "speedtest" (speedtest.net) or "http" (fixed-size transfers, see http_probe)
+    "speed_probe": "speedtest",
+
+    # Seconds the speedtest.net configuration and chosen server are reused before they are fetched again
+    "speedtest_cache_ttl": 3600,
+
+    # Endpoints of the "http" throughput probe; {bytes} in download_url is replaced by download_bytes.
+    # The download is cut off after download_bytes, the upload POSTs upload_bytes random bytes.
+    "http_probe": {
+        "download_url": "https://speed.cloudflare.com/__down?bytes={bytes}",
+        "upload_url": "https://speed.cloudflare.com/__up",
+        "download_bytes": 10 * 1000 * 1000,
+        "upload_bytes": 2 * 1000 * 1000,
+        "timeout": 30
+    },
+
+    # Store the duration of each probe stage with the sample ("timings_ms", see src/timings.py)
+    "sample_timings": True,
+
+    # Interface whose signal level is read on Linux; None takes the first wireless one
+    "wireless_interface": None,
+
+    # Values returned by the "fake" backend; every probe takes delay_s seconds
+    "fake_probe": {
+        "delay_s": 0.0,
+        "rssi": -55,
+        "rtts_ms": [12.0, 14.5, 11.8, 13.1, None, 12.6, 15.2, 12.2, 13.9, 12.4],
+        "download_speed": 95.0,
+        "upload_speed": 42.0
+    }
+}
+
+# Standalone collector process (python -m src.collector), controlled by the web app
+# through a document in MongoDB (see src/control.py)
+DAEMON_CONFIG = {
+    # Locations sampled when collection is started from /collection: [name, x, y]
+    "locations": [
+        ['ECC', 67.12, -43.45],
+        # ['GEC', 70.21, -40.31], ['SDB', 65.78, -42.5],
+        # ['FOODCOURT', 68.33, -41.25], ['LOUNGE', 69.0, -39.9]
+    ],
+
+    # Seconds between two reads of the control document, and between two heartbeats
+    "poll_interval": 1.0,
+    "heartbeat_interval": 5.0,
+
+    # A collector whose last heartbeat is older than this is considered gone
+    "stale_after": 20.0,
+
+    # Seconds the collector waits for a stopped collection to finish its current samples
+    "stop_timeout": 30.0
+}
+
+# Adaptive sampling of the locations (see src/scheduler.py)
+SCHEDULER_CONFIG = {
+    # "Start Collection" on /collection runs the scheduler until stopped instead of a single run
+    "enabled": False,
+
+    # Seconds between two samples of a location while its metrics are normal. Degraded
+    # locations are sampled down to every min_interval seconds; stable ones back off again
+    # up to max_interval (raise it above base_interval to sample stable locations less often)
+    "base_interval": 300,
+    "min_interval": 30,
+    "max_interval": 300,
+    "speedup_factor": 0.5,
+    "backoff_factor": 1.5,
+    "stable_samples": 3,
+
+    # A sample is degraded when packet loss (%) exceeds loss_threshold, latency exceeds
+    # latency_spike_factor x its usual level (and by at least latency_spike_min_ms),
+    # or RSSI is rssi_drop below its usual level (a moving average with weight baseline_alpha)
+    "loss_threshold": 2.0,
+    "latency_spike_factor": 2.0,
+    "latency_spike_min_ms": 20.0,
+    "rssi_drop": 10,
+    "baseline_alpha": 0.2,
+
+    # Probes started per rolling hour: per location (a number, or {name: number, "default": number})
+    # and in total across all locations and collection jobs. None means unlimited.
+    "location_budget_per_hour": 30,
+    "max_probes_per_hour": 60,
+
+    # Locations probed at the same time, and the longest the scheduler sleeps between checks
+    "max_workers": 5,
+    "tick": 1.0
+}
+
+# Append-only local log of every sample (see src/spool.py)
+SPOOL_CONFIG = {
+    "directory": "data/spool",
+
+    # fsync after this many records or seconds, whichever comes first
+    "fsync_every": 10,
+    "fsync_interval": 5,
+
+    # Start a new file once the current one reaches this size (bytes) or age (seconds)
+    "max_bytes": 16 * 1024 * 1024,
+    "max_age": 24 * 3600,
+
+    # gzip files once they are rotated out
+    "compress": True
+}
+
+# Write-behind queue between the probes and MongoDB (see src/writer.py)
+WRITER_CONFIG = {
+    # A batch is written once it has batch_size samples or flush_interval seconds passed
+    "batch_size": 100,
+    "flush_interval": 2.0,
+
+    # Samples held in memory; when full, producers wait up to put_timeout seconds
+    "max_queue": 10000,
+    "put_timeout": 5.0,
+
+    # Durable buffer of samples not confirmed in MongoDB yet (see src/offline_buffer.py)
+    "buffer_path": "data/offline_buffer.sqlite3",
+
+    # While MongoDB is unreachable the buffer is replayed every replay_interval seconds,
+    # doubling up to max_replay_interval, in batches of replay_batch_size
+    "replay_interval": 5.0,
+    "max_replay_interval": 300.0,
+    "replay_batch_size": 1000,
+
+    # Seconds a collection waits for its queued samples to be written when it ends
+    "flush_timeout": 30.0
+}
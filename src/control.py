@@ -0,0 +1,192 @@
+import os
+import re
+import socket
+from datetime import datetime, timezone, timedelta
+from uuid import uuid4
+from Database.database import get_db_connection, COLLECTOR_CONTROL_COLLECTION, COLLECTION_JOBS_COLLECTION
+from src.config import DAEMON_CONFIG, SCHEDULER_CONFIG
+
+# The web app and the collector process (src/collector.py) talk through MongoDB.
+#
+# collector_control - one document about the collector process itself:
+# {
+#     "_id": "collector",
+#     "state": "running",                  # "running" (polling for requests) / "offline"
+#     "owner": "host:1234",                # collector process holding the document
+#     "heartbeat_at": datetime,            # refreshed every heartbeat_interval seconds
+#     "message": "...",
+#     "timings": [{"location": "ECC", "stage": "speed", "count": 12, "p95": 21.4, ...}]
+#                                          # stage histograms (src/timings.py), with every heartbeat
+# }
+#
+# collection_jobs - one document per named collection job (see src/jobs.py):
+# {
+#     "_id": "default",                    # job name
+#     "desired": "running",                # what the web app asked for: "running" / "stopped"
+#     "command_id": "9b1e...",              # changes with every start request
+#     "mode": "run",                        # "run" (one pass) or "scheduled" (until stopped)
+#     "locations": [["ECC", 67.12, -43.45]],
+#     "schedule": {"base_interval": 120},   # SCHEDULER_CONFIG overrides of a scheduled job
+#     "requested_at": datetime,
+#
+#     "state": "running",                  # reported by the collector: running / stopping /
+#                                          # finished / stopped / failed / interrupted
+#     "progress": {"samples": 12, "samples_per_min": 1.5, "sample_seconds": {...}, ...},
+#     "updated_at": datetime, "error": null
+# }
+#
+# The web app only writes the request fields, the collector the state fields (and "desired"
+# once a one-pass job is done), so both can $set their part without overwriting the other.
+# Any number of web workers, on any host that reaches MongoDB, see the same state.
+
+CONTROL_ID = "collector"
+
+# Job started and stopped by the buttons on /collection
+DEFAULT_JOB = "default"
+
+JOB_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+JOB_MODES = ("run", "scheduled")
+
+
+def _control():
+    return get_db_connection()[COLLECTOR_CONTROL_COLLECTION]
+
+
+def _jobs():
+    return get_db_connection()[COLLECTION_JOBS_COLLECTION]
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def process_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# Function to check a job request from the API. Returns (locations, mode, schedule); raises ValueError.
+def validate_job_request(locations=None, mode=None, schedule=None):
+    locations = locations or DAEMON_CONFIG["locations"]
+    if not isinstance(locations, list):
+        raise ValueError("locations must be a list of [name, x, y]")
+    for location in locations:
+        if (not isinstance(location, list) or len(location) != 3 or not isinstance(location[0], str)
+                or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in location[1:])):
+            raise ValueError(f"Invalid location {location!r}, expected [name, x, y]")
+    mode = mode or ("scheduled" if SCHEDULER_CONFIG["enabled"] else "run")
+    if mode not in JOB_MODES:
+        raise ValueError(f"mode must be one of {', '.join(JOB_MODES)}")
+    schedule = schedule or {}
+    if not isinstance(schedule, dict):
+        raise ValueError("schedule must be an object")
+    unknown = set(schedule) - (set(SCHEDULER_CONFIG) - {"enabled"})
+    if unknown:
+        raise ValueError(f"Unknown schedule settings: {', '.join(sorted(unknown))}")
+    if "max_probes_per_hour" in schedule:
+        raise ValueError("max_probes_per_hour is shared by all jobs and can't be set per job")
+    return locations, mode, schedule
+
+
+# Function to ask the collector to start a job. Returns the id of the request.
+def request_start(name=DEFAULT_JOB, locations=None, mode=None, schedule=None):
+    if not JOB_NAME_PATTERN.match(name or ""):
+        raise ValueError("Job names are 1-64 letters, digits, '_', '-' or '.'")
+    locations, mode, schedule = validate_job_request(locations, mode, schedule)
+    command_id = uuid4().hex
+    _jobs().update_one({"_id": name}, {"$set": {
+        "desired": "running",
+        "command_id": command_id,
+        "mode": mode,
+        "locations": locations,
+        "schedule": schedule,
+        "requested_at": _now()
+    }}, upsert=True)
+    return command_id
+
+
+# Function to ask the collector to stop a job; samples already taken are still written.
+# Returns False when there is no such job.
+def request_stop(name=DEFAULT_JOB):
+    result = _jobs().update_one({"_id": name}, {"$set": {"desired": "stopped", "requested_at": _now()}})
+    return result.matched_count > 0
+
+
+def read_control():
+    return _control().find_one({"_id": CONTROL_ID}) or {}
+
+
+def read_jobs():
+    return list(_jobs().find())
+
+
+def read_job(name):
+    return _jobs().find_one({"_id": name})
+
+
+# Function to update the collector document and its heartbeat (collector side)
+def report_state(**fields):
+    _control().update_one(
+        {"_id": CONTROL_ID}, {"$set": {**fields, "heartbeat_at": _now()}}, upsert=True
+    )
+
+
+# Function to update the state fields of a job document (collector side)
+def report_job(name, **fields):
+    _jobs().update_one({"_id": name}, {"$set": {**fields, "updated_at": _now()}})
+
+
+# Function to mark a finished one-pass job as done, unless a new request replaced it meanwhile
+def complete_job(name, command_id):
+    _jobs().update_one(
+        {"_id": name, "command_id": command_id, "desired": "running"},
+        {"$set": {"desired": "stopped"}}
+    )
+
+
+def collector_alive(control, now=None):
+    heartbeat = control.get("heartbeat_at")
+    if heartbeat is None or control.get("state") == "offline":
+        return False
+    if heartbeat.tzinfo is None:
+        heartbeat = heartbeat.replace(tzinfo=timezone.utc)
+    return (now or _now()) - heartbeat <= timedelta(seconds=DAEMON_CONFIG["stale_after"])
+
+
+# Function to summarise a job document for the API
+def job_status(job, alive):
+    # A start request counts as running as soon as it is made, so the page doesn't flicker
+    state = job.get("state")
+    running = alive and (state in ("running", "stopping") or job.get("desired") == "running")
+    progress = job.get("progress") or {}
+    return {
+        "name": job["_id"],
+        "running": running,
+        "desired": job.get("desired"),
+        "state": state if alive else "offline",
+        "mode": job.get("mode"),
+        "locations": job.get("locations"),
+        "samples": progress.get("samples", 0),
+        "buffered": progress.get("buffered", 0),
+        "failed": progress.get("failed", 0),
+        "samples_per_min": progress.get("samples_per_min", 0.0),
+        "sample_seconds": progress.get("sample_seconds"),
+        "started_at": progress.get("started_at"),
+        "last_sample_at": progress.get("last_sample_at"),
+        "scheduler": progress.get("scheduler"),
+        "error": job.get("error")
+    }
+
+
+# Function to summarise the collector and all of its jobs for the web app
+def collection_status():
+    control = read_control()
+    alive = collector_alive(control)
+    jobs = [job_status(job, alive) for job in read_jobs()]
+    return {
+        "running": any(job["running"] for job in jobs),
+        "collector_alive": alive,
+        "owner": control.get("owner") if alive else None,
+        "message": control.get("message"),
+        "samples_per_min": round(sum(job["samples_per_min"] for job in jobs if job["running"]), 2),
+        "jobs": jobs
+    }
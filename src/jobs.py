@@ -0,0 +1,182 @@
+import math
+import time
+from collections import deque
+from datetime import datetime, timezone
+from threading import Thread, Event, Lock
+from src.main import start_collection, start_scheduled_collection, create_scheduler, collect_sample
+from src.writer import QUEUED, BUFFERED
+
+# Collection jobs run by the collector process (src/collector.py).
+# A job is a named collection with its own locations, mode ("run": one pass, "scheduled":
+# adaptive sampling until stopped, optionally with its own scheduler settings), its own stop
+# token and live progress counters. Any number of jobs run at the same time.
+
+# Seconds of recent samples the throughput (samples/min) is computed over
+THROUGHPUT_WINDOW = 300
+
+# Sample durations kept per job for the duration statistics
+DURATION_HISTORY = 200
+
+
+def _utc(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc) if timestamp else None
+
+
+class CollectionJob:
+
+    def __init__(self, name, locations, mode="run", schedule=None, command_id=None):
+        self.name = name
+        self.locations = locations
+        self.mode = mode
+        self.schedule = schedule or {}
+        self.command_id = command_id
+        self.stop_token = Event()
+        self.error = None
+        self._thread = None
+        self._scheduler = None
+        self._lock = Lock()
+        self._samples = 0
+        self._buffered = 0
+        self._failed = 0
+        self._started_at = None
+        self._finished_at = None
+        self._last_sample_at = None
+        self._recent = deque()                           # completion times within THROUGHPUT_WINDOW
+        self._durations = deque(maxlen=DURATION_HISTORY)  # seconds per sample
+
+    def start(self):
+        self._started_at = time.time()
+        self._thread = Thread(target=self._run, name=f"job-{self.name}", daemon=True)
+        self._thread.start()
+
+    # Function to ask the job to stop; probes in flight are abandoned, samples taken are still written
+    def stop(self):
+        self.stop_token.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def state(self):
+        if self.is_running():
+            return "stopping" if self.stop_token.is_set() else "running"
+        if self.error:
+            return "failed"
+        return "stopped" if self.stop_token.is_set() else "finished"
+
+    def _run(self):
+        try:
+            if self.mode == "scheduled":
+                self._scheduler = create_scheduler(self.locations, self.stop_token, self._collect, self.schedule)
+                start_scheduled_collection(self.locations, scheduler=self._scheduler)
+            else:
+                start_collection(self.locations, self.stop_token, self._collect)
+        except Exception as e:
+            self.error = str(e)
+            print(f"❌ [Job {self.name}] {e}")
+        finally:
+            self._finished_at = time.time()
+
+    # Returns the measurement whenever the probes delivered one, so the scheduler adapts on the
+    # metrics alone and doesn't take database backpressure for a degraded location
+    def _collect(self, location, run_no):
+        started = time.perf_counter()
+        measurement, status = None, "failed"
+        try:
+            measurement, status = collect_sample(location, run_no, self.stop_token)
+            return measurement
+        finally:
+            self._record(status, time.perf_counter() - started)
+
+    def _record(self, status, seconds):
+        now = time.time()
+        with self._lock:
+            if status in (QUEUED, BUFFERED):
+                self._samples += 1
+                self._recent.append(now)
+                if status == BUFFERED:
+                    self._buffered += 1
+            else:
+                self._failed += 1
+            self._last_sample_at = now
+            self._durations.append(seconds)
+
+    # Function to get the live counters of the job
+    def progress(self):
+        now = time.time()
+        with self._lock:
+            while self._recent and self._recent[0] < now - THROUGHPUT_WINDOW:
+                self._recent.popleft()
+            durations = sorted(self._durations)
+            lifetime = max((self._finished_at or now) - (self._started_at or now), 1.0)
+            if self._finished_at is None:
+                # Over the window, or over the job's lifetime while it is younger than that
+                rate = len(self._recent) / min(THROUGHPUT_WINDOW, lifetime)
+            else:
+                rate = self._samples / lifetime
+            return {
+                "samples": self._samples,
+                "buffered": self._buffered,     # samples waiting in the offline buffer
+                "failed": self._failed,
+                "samples_per_min": round(60.0 * rate, 2),
+                "sample_seconds": {
+                    "last": round(self._durations[-1], 2) if self._durations else None,
+                    "mean": round(sum(durations) / len(durations), 2) if durations else None,
+                    "p95": round(durations[math.ceil(0.95 * len(durations)) - 1], 2) if durations else None,
+                    "max": round(durations[-1], 2) if durations else None
+                },
+                "started_at": _utc(self._started_at),
+                "finished_at": _utc(self._finished_at),
+                "last_sample_at": _utc(self._last_sample_at),
+                # Intervals, degraded locations and budget use of a scheduled job
+                "scheduler": self._scheduler.status() if self._scheduler is not None else None
+            }
+
+
+class JobManager:
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = Lock()
+
+    # Function to start a job; a job of the same name must not be running
+    def start(self, name, locations, mode="run", schedule=None, command_id=None):
+        with self._lock:
+            current = self._jobs.get(name)
+            if current is not None and current.is_running():
+                raise ValueError(f"Job '{name}' is already running")
+            job = CollectionJob(name, locations, mode, schedule, command_id)
+            self._jobs[name] = job
+        job.start()
+        print(f"🚀 [Job {name}] started: {mode}, {len(locations)} location(s)")
+        return job
+
+    def stop(self, name):
+        job = self.get(name)
+        if job is None or not job.is_running():
+            return False
+        if job.stop_token.is_set():
+            return True
+        job.stop()
+        print(f"🛑 [Job {name}] stopping")
+        return True
+
+    def stop_all(self, timeout=None):
+        jobs = self.list()
+        for job in jobs:
+            job.stop()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in jobs:
+            job.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def get(self, name):
+        with self._lock:
+            return self._jobs.get(name)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
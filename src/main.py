@@ -1,198 +1,310 @@
-import json
 from datetime import datetime
-import speedtest
 import time
-import subprocess
-import re
-from threading import Event
-from Database.database import get_db_connection
+import asyncio
+from threading import Event, Lock
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pymongo import ReturnDocument
+from Database.database import get_db_connection, register_shutdown_hook, MEASUREMENTS_COLLECTION, COUNTERS_COLLECTION
+from Database.models import make_measurement
+from src.config import COLLECTOR_CONFIG
+from src.probes import get_probe_backend, summarize_rtts
+from src.scheduler import AdaptiveScheduler, get_probe_budget
+from src.spool import get_spool
+from src.timings import SampleTimer, TimingRegistry, get_timings
+from src.writer import get_writer, QUEUED, BUFFERED, DROPPED
 
 stop_event = Event()
 
-# Function to get WiFi RSSI on Windows using netsh
-def get_rssi():
-    try:
-        result = subprocess.run(['netsh', 'wlan', 'show', 'interfaces'], capture_output=True, text=True)
-        match = re.search(r"Signal\s+:\s+(\d+)", result.stdout)
-        return int(match.group(1)) if match else None
-    except Exception as e:
-        print(f"Error getting RSSI: {e}")
-        return None
+# Seconds between two checks of stop_event while waiting for a probe
+PROBE_POLL_INTERVAL = 0.2
 
-# Function to get packet loss, jitter, and latency using ping
-def get_ping_stats():
-    try:
-        result = subprocess.run(['ping', '-n', '10', '8.8.8.8'], capture_output=True, text=True)
-        output = result.stdout
-        match_loss = re.search(r"(\d+)% packet loss", output)
-        packet_loss = float(match_loss.group(1)) if match_loss else 0.0
-        match_latency = re.search(r"Average = (\d+)ms", output)
-        latency = float(match_latency.group(1)) if match_latency else 0.0
-        jitter = 0.0  # Jitter estimation not available in ping
-        return latency, jitter, packet_loss
-    except Exception as e:
-        print(f"Error getting ping stats: {e}")
-        return None, None, None
+# Speed tests run on their own thread. Not the asyncio default executor, which
+# asyncio.run() waits for on exit, so a timed-out speed test can't hold up the sample.
+_speedtest_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speedtest")
 
-# Function to get download and upload speeds using speedtest-cli
+# Held while a throughput probe runs, by any location of any job: speed tests started from
+# the same host share its uplink, so two at once would each measure a fraction of it.
+# A timed-out speed test keeps it until its thread really finishes.
+_speed_slot = Lock()
+
+# Function to get download and upload speeds in Mbps
 def get_speed():
     try:
-        st = speedtest.Speedtest()
-        st.get_best_server()
-        download_speed = st.download() / 1e6  # Mbps
-        upload_speed = st.upload() / 1e6  # Mbps
-        return download_speed, upload_speed
+        return get_probe_backend().speed()
     except Exception as e:
         print(f"Error getting speed: {e}")
         return None, None
 
-# Function to write data to a JSON file
-def write_to_json_file(download_speed, upload_speed, latency_ms, jitter_ms, packet_loss, rssi,
-                       location, position_x, position_y, run_no, filename=r"data/wifi_data.json"):
-    try:
-        try:
-            with open(filename, 'r') as f:
-                existing_data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            existing_data = {}
-
-        entry = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "run_no": run_no,
-            "location": {
-                "position[x]": position_x,
-                "position[y]": position_y,
-                "position[name]": location
-            },
-            "download_speed": download_speed,
-            "upload_speed": upload_speed,
-            "latency_ms": latency_ms,
-            "jitter_ms": jitter_ms,
-            "packet_loss": packet_loss,
-            "rssi": rssi
-        }
-
-        if location not in existing_data:
-            existing_data[location] = []
-
-        existing_data[location].append(entry)
-
-        with open(filename, 'w') as f:
-            json.dump(existing_data, f, indent=4)
-    except Exception as e:
-        print(f"Error writing to JSON file: {e}")
-
-
-# Function to store data in MongoDB in nested format by location
-def store_data_in_db(location_name, position_x, position_y, data):
+# Function to await a probe, giving up (and cancelling it) after `timeout` seconds or
+# as soon as the collection is stopped. Returns `default` when the probe didn't finish.
+async def _await_probe(name, coroutine, timeout, default, stop_token=stop_event):
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(coroutine)
+    deadline = loop.time() + timeout
+    while not task.done():
+        remaining = deadline - loop.time()
+        if stop_token.is_set() or remaining <= 0:
+            task.cancel()
+            print(f"⚠️ {name} probe {'cancelled' if stop_token.is_set() else 'timed out'}")
+            try:
+                await task
+            except BaseException:
+                pass
+            return default
+        await asyncio.wait({task}, timeout=min(PROBE_POLL_INTERVAL, remaining))
     try:
-        db = get_db_connection()
-        wifi_data_col = db["wifi_data"]
-
-        # Prepare new entry
-        new_entry = {
-            "timestamp": data['timestamp'],
-            "run_no": data['run_no'],
-            "location": {
-                "position[x]": position_x,
-                "position[y]": position_y,
-                "position[name]": location_name
-            },
-            "download_speed": data['download_speed'],
-            "upload_speed": data['upload_speed'],
-            "latency_ms": data['latency_ms'],
-            "jitter_ms": data['jitter_ms'],
-            "packet_loss": data['packet_loss'],
-            "rssi": data['rssi']
-        }
-
-        # Upsert by location_name: Push the new run data into the array
-        wifi_data_col.update_one(
-            {"_id": location_name},
-            {"$push": {location_name: new_entry}},
-            upsert=True
-        )
-
-        print(f"✅ Data stored under {location_name}")
+        return task.result()
     except Exception as e:
-        print(f"❌ Error storing data in MongoDB: {e}")
-
-# Main function to collect and store WiFi data
-def collect_and_store_data(location_list, run_no):
-    for location in location_list:
-        if stop_event.is_set():
-            print("Data collection interrupted.")
-            break
-
-        if len(location) != 3:
-            print("Invalid location format. Skipping:", location)
-            continue
-
-        location_name, position_x, position_y = location
+        print(f"Error getting {name}: {e}")
+        return default
 
-        print(f"[Run {run_no}] getting Data for {location_name}...")
+async def _measure(stop_token, timer):
+    timeouts = COLLECTOR_CONFIG["probe_timeouts"]
 
-        download_speed, upload_speed = get_speed()
-        latency, jitter, packet_loss = get_ping_stats()
-        rssi = get_rssi()
+    with timer.stage("setup"):
+        backend = get_probe_backend()
 
-        if all(val is not None for val in [download_speed, upload_speed, latency]):
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    async def timed(name, awaitable):
+        # Until the probe returned, timed out or was cancelled
+        with timer.stage(name):
+            return await awaitable
 
-            write_to_json_file(
-                download_speed, upload_speed, latency, jitter, packet_loss,
-                rssi, location_name, position_x, position_y, run_no=run_no
-            )
-
-            data = {
-                "timestamp": timestamp,
-                "download_speed": download_speed,
-                "upload_speed": upload_speed,
-                "latency_ms": latency,
-                "jitter_ms": jitter,
-                "packet_loss": packet_loss,
-                "rssi": rssi,
-                "run_no": run_no
-            }
-
-            store_data_in_db(location_name, position_x, position_y, data)
-            print(f"[Run {run_no}] Data saved at {timestamp} for {location_name}")
-        else:
-            print(f"[Run {run_no}] Data can't be saved at {timestamp} for {location_name}")
-        time.sleep(5)
+    def speed_test():
+        try:
+            # The speed test's own setup (config and server fetch) is timed on its thread
+            with timer.activate():
+                return get_speed()
+        finally:
+            _speed_slot.release()
+
+    async def speed_probe():
+        with timer.stage("speed_wait"):
+            while not _speed_slot.acquire(blocking=False):
+                if stop_token.is_set():
+                    return None, None
+                await asyncio.sleep(PROBE_POLL_INTERVAL)
+        future = _speedtest_executor.submit(speed_test)
+        # Cancelled before its thread picked it up: speed_test never runs to release the slot
+        future.add_done_callback(lambda f: f.cancelled() and _speed_slot.release())
+        return await timed("speed", _await_probe(
+            "speed", asyncio.wrap_future(future), timeouts["speedtest"], (None, None), stop_token
+        ))
+
+    speed = asyncio.ensure_future(speed_probe())
+
+    async def probe(name, run, default):
+        # Probes listed in serialize_with_speedtest wait for the speed test to finish first
+        if name in COLLECTOR_CONFIG["serialize_with_speedtest"]:
+            await asyncio.wait({speed})
+            if stop_token.is_set():
+                return default
+        return await timed(name, _await_probe(name, run(), timeouts[name], default, stop_token))
+
+    with timer.stage("measure"):
+        (download_speed, upload_speed), ping_stats, rssi = await asyncio.gather(
+            speed,
+            probe("ping", backend.ping, summarize_rtts([])),
+            probe("rssi", backend.rssi, None)
+        )
+    return {"download_speed": download_speed, "upload_speed": upload_speed, **ping_stats, "rssi": rssi}
+
+# Function to take one sample: speed test, ping and RSSI run at the same time,
+# so a sample takes about as long as its slowest probe.
+# Returns the metrics of the sample as a dict (the metric and per-packet ping fields of Database/models.py).
+# Probes are abandoned once `stop_token` (an Event, stop_event by default) is set.
+# `timer` (a SampleTimer, see src/timings.py) receives the duration of every probe.
+def measure(stop_token=None, timer=None):
+    timer = timer or SampleTimer(None, TimingRegistry())
+    return asyncio.run(_measure(stop_token or stop_event, timer))
+
+# Function to store a measurement document in MongoDB.
+# The document is queued on the write-behind writer (src/writer.py) and written in a batch.
+# Returns the result of the writer: QUEUED, BUFFERED (written once MongoDB keeps up again)
+# or DROPPED.
+def store_measurement_in_db(measurement):
+    try:
+        return get_writer().put(measurement)
+    except Exception as e:
+        print(f"❌ Error queueing data for MongoDB: {e}")
+        return DROPPED
+
+# Function to probe one location and store the result.
+# Returns (measurement, status): status is the writer's QUEUED, BUFFERED or DROPPED, or
+# "failed" with no measurement when the probes didn't deliver the required metrics.
+# Every stage is timed into the per-location histograms of src/timings.py.
+def collect_sample(location, run_no, stop_token=None):
+    if len(location) != 3:
+        print("Invalid location format. Skipping:", location)
+        return None, "failed"
+
+    timer = SampleTimer(location[0])
+    with timer.stage("total"):
+        return _collect_location(location, run_no, stop_token, timer)
+
+# Function to probe one location and store the result.
+# Returns the measurement document, or None when the probes failed. A sample the database
+# couldn't take right away is still returned: its metrics are valid.
+def collect_location(location, run_no, stop_token=None):
+    measurement, status = collect_sample(location, run_no, stop_token)
+    return measurement
+
+def _collect_location(location, run_no, stop_token, timer):
+    location_name, position_x, position_y = location
+
+    print(f"[Run {run_no}] getting Data for {location_name}...")
+
+    metrics = measure(stop_token, timer)
+
+    measured_at = datetime.now()
+    timestamp = measured_at.strftime("%Y-%m-%d %H:%M:%S")
+    if not all(metrics[field] is not None for field in ["download_speed", "upload_speed", "latency_ms"]):
+        print(f"[Run {run_no}] Data can't be saved at {timestamp} for {location_name}")
+        return None, "failed"
+
+    data = {
+        "timestamp": measured_at,
+        **metrics,
+        "run_no": run_no
+    }
+    if COLLECTOR_CONFIG["sample_timings"]:
+        data["timings_ms"] = timer.as_metadata()
+
+    measurement = make_measurement(location_name, position_x, position_y, data)
+    # The local spool keeps every sample, also when MongoDB is unreachable
+    with timer.stage("spool"):
+        try:
+            get_spool().append(measurement)
+        except Exception as e:
+            print(f"Error writing to spool: {e}")
+    with timer.stage("db_queue"):
+        status = store_measurement_in_db(measurement)
+    if status == QUEUED:
+        print(f"[Run {run_no}] Data saved at {timestamp} for {location_name}")
+    elif status == BUFFERED:
+        print(f"[Run {run_no}] Data buffered at {timestamp} for {location_name}, written once MongoDB catches up")
+    else:
+        # Only the spool has it, which isn't a database save
+        print(f"[Run {run_no}] Data can't be saved at {timestamp} for {location_name}")
+    return measurement, status
+
+# Main function to collect and store WiFi data.
+# With max_workers > 1 the locations are probed concurrently, so the run takes about as long
+# as its slowest location; with 1 they are probed one after another with a pause in between.
+# `stop_token` (stop_event by default) interrupts the run; `collect(location, run_no)` takes
+# one sample (collect_location by default).
+def collect_and_store_data(location_list, run_no, max_workers=None, stop_token=None, collect=None):
+    if max_workers is None:
+        max_workers = COLLECTOR_CONFIG["max_workers"]
+    stop_token = stop_token or stop_event
+    collect = collect or _collector(stop_token)
+
+    if max_workers > 1 and len(location_list) > 1:
+        collect_concurrently(location_list, run_no, max_workers, stop_token, collect)
+    else:
+        for index, location in enumerate(location_list):
+            if stop_token.is_set():
+                print("Data collection interrupted.")
+                break
+            collect(location, run_no)
+            if index == len(location_list) - 1:
+                break
+            # wait() returns early when the collection is stopped
+            started = time.perf_counter()
+            stopped = stop_token.wait(COLLECTOR_CONFIG["pause_seconds"])
+            get_timings().record(location[0] if location else None, "sleep", time.perf_counter() - started)
+            if stopped:
+                print("Data collection interrupted.")
+                break
     print(f"[Run {run_no}] Data collection is Completed.")
 
-
+# Function to probe the locations of a run on a pool of at most max_workers threads
+def collect_concurrently(location_list, run_no, max_workers, stop_token=None, collect=None):
+    stop_token = stop_token or stop_event
+    collect = collect or _collector(stop_token)
+
+    def collect_unless_stopped(location):
+        # Locations still queued when the collection is stopped are skipped
+        if stop_token.is_set():
+            return None
+        return collect(location, run_no)
+
+    workers = min(max_workers, len(location_list))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"collect-run{run_no}") as pool:
+        futures = {pool.submit(collect_unless_stopped, location): location for location in location_list}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ [Run {run_no}] Error collecting {futures[future]}: {e}")
+    if stop_token.is_set():
+        print("Data collection interrupted.")
+
+# Function to get a collect(location, run_no) that stops probing once stop_token is set
+def _collector(stop_token):
+    return lambda location, run_no: collect_location(location, run_no, stop_token)
+
+
+# Function to allocate the next run number of the day.
+# Uses an atomic $inc on a per-day counter, so every collector that starts gets its own number.
 def get_next_run_no():
     try:
         db = get_db_connection()
-        wifi_data_col = db["wifi_data"]
+        counters = db[COUNTERS_COLLECTION]
 
         today = datetime.now().strftime("%Y-%m-%d")
-        max_run = 0
-
-        for doc in wifi_data_col.find():
-            key = doc["_id"]
-            if isinstance(doc.get(key), list):
-                for entry in doc[key]:
-                    if "run_no" in entry and "timestamp" in entry:
-                        entry_date = entry["timestamp"].split(" ")[0]
-                        if entry_date == today:
-                            max_run = max(max_run, entry["run_no"])
-
-        return max_run + 1
+        counter_id = f"run_no:{today}"
+
+        counter = counters.find_one_and_update(
+            {"_id": counter_id}, {"$inc": {"seq": 1}}, return_document=ReturnDocument.AFTER
+        )
+        if counter is None:
+            # First run of the day: seed the counter from runs already stored today
+            # (served by the (date, run_no) index). $max keeps concurrent seeding safe.
+            latest = db[MEASUREMENTS_COLLECTION].find_one({"date": today}, {"run_no": 1}, sort=[("run_no", -1)])
+            counters.update_one(
+                {"_id": counter_id}, {"$max": {"seq": latest["run_no"] if latest else 0}}, upsert=True
+            )
+            counter = counters.find_one_and_update(
+                {"_id": counter_id}, {"$inc": {"seq": 1}}, return_document=ReturnDocument.AFTER
+            )
+
+        return counter["seq"]
     except Exception as e:
         print(f"Error fetching run_no: {e}")
         return 1
 
 
 
-def start_collection(location_list):
+# Function to count the samples of a one-pass run in the probe budget shared with the
+# scheduler (src/scheduler.py); one-pass runs aren't limited by it themselves
+def _counted(collect):
+    def collect_counted(location, run_no):
+        get_probe_budget().record()
+        return collect(location, run_no)
+    return collect_counted
+
+def start_collection(location_list, stop_token=None, collect=None):
+    register_shutdown_hook()
     run_no = get_next_run_no()
     print(f"Starting data collection for Run {run_no} across {len(location_list)} locations...")
-    collect_and_store_data(location_list, run_no)
+    collect = _counted(collect or _collector(stop_token or stop_event))
+    collect_and_store_data(location_list, run_no, stop_token=stop_token, collect=collect)
+    get_writer().flush()
+    get_spool().flush()
     return True
 
-def stop_collection():
-    stop_event.set()
-    print("Data collection stopped.")
+# Function to create the adaptive scheduler (src/scheduler.py) of a collection.
+# `schedule` overrides SCHEDULER_CONFIG entries for this collection.
+def create_scheduler(location_list, stop_token=None, collect=None, schedule=None):
+    stop_token = stop_token or stop_event
+    return AdaptiveScheduler(location_list, collect or _collector(stop_token), get_next_run_no, stop_token, schedule)
+
+# Function to sample the locations with the adaptive scheduler until stopped.
+# Pass `scheduler` (from create_scheduler) to run one the caller keeps an eye on.
+def start_scheduled_collection(location_list, stop_token=None, collect=None, schedule=None, scheduler=None):
+    register_shutdown_hook()
+    print(f"Starting scheduled data collection across {len(location_list)} locations...")
+    (scheduler or create_scheduler(location_list, stop_token, collect, schedule)).run()
+    get_writer().flush()
+    get_spool().flush()
+    return True
@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import time
+from threading import Lock
+from bson import json_util
+
+# Durable local queue of measurements that are not confirmed in MongoDB yet.
+# The collector adds every sample here before queueing it for MongoDB and removes it once
+# it is stored, so whatever is still in the buffer after an outage or a crash is replayed.
+# SQLite in WAL mode keeps an insert cheap (no full fsync per sample) and crash-safe.
+#
+#   pending(sample_id TEXT PRIMARY KEY, payload TEXT, queued_at REAL)
+#
+# payload is the measurement document as Extended JSON, so datetimes survive the round trip.
+# Samples are keyed by their _id: adding one twice keeps a single row, and MongoDB skips ids
+# it already has, so replaying a sample that was in fact stored never creates a duplicate.
+
+
+class OfflineBuffer:
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            "sample_id TEXT PRIMARY KEY, payload TEXT NOT NULL, queued_at REAL NOT NULL)"
+        )
+
+    def add(self, measurements):
+        rows = [(str(doc["_id"]), json_util.dumps(doc), time.time()) for doc in measurements]
+        with self._lock:
+            self._connection.executemany("INSERT OR IGNORE INTO pending VALUES (?, ?, ?)", rows)
+
+    def remove(self, sample_ids):
+        with self._lock:
+            self._connection.executemany("DELETE FROM pending WHERE sample_id = ?", [(str(i),) for i in sample_ids])
+
+    # Function to get the oldest buffered measurements, up to `limit`
+    def oldest(self, limit):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT payload FROM pending ORDER BY queued_at LIMIT ?", (limit,)
+            ).fetchall()
+        return [json_util.loads(payload) for (payload,) in rows]
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,371 @@
+import os
+import re
+import abc
+import sys
+import copy
+import math
+import time
+import errno
+import random
+import struct
+import socket
+import asyncio
+import threading
+import requests
+import speedtest
+from Database.models import encode_rtts, signal_quality_to_dbm
+from src.config import COLLECTOR_CONFIG
+from src.timings import stage
+
+# Probe backends: how RSSI, ping statistics and throughput are measured on a platform.
+#
+#   WindowsProbeBackend - netsh and ping.exe, run as (cancellable) async subprocesses
+#   LinuxProbeBackend   - /proc/net/wireless and ICMP sockets, no process spawned per sample
+#   FakeProbeBackend    - fixed values, for tests and for running the collector without a network
+#
+# COLLECTOR_CONFIG["probe_backend"] picks one ("auto" chooses by platform).
+# rssi() and ping() are coroutines; speed() is blocking and runs on a worker thread.
+# speed() uses speedtest.net or, with COLLECTOR_CONFIG["speed_probe"] = "http", fixed-size
+# transfers against a configurable HTTP endpoint, which is far quicker and lighter on the network.
+# ping() returns the summarize_rtts() statistics of its echo requests, None values when it failed.
+
+
+# Function to run a command without blocking the event loop; the process is killed if the probe is cancelled
+async def run_command(args):
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        stdout, _ = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    return stdout.decode(errors='replace')
+
+
+# Function to summarise round trip times (ms, None for a lost packet) in one pass:
+# latency (mean), jitter, min/max/p95 and packet loss, plus the packed per-packet rtts
+def summarize_rtts(rtts):
+    stats = {"latency_ms": None, "jitter_ms": None, "packet_loss": None,
+             "rtt_min_ms": None, "rtt_max_ms": None, "rtt_p95_ms": None, "rtts": None}
+    if not rtts:
+        return stats
+    received = []
+    total = 0.0
+    jitter = None
+    previous = None
+    for rtt in rtts:
+        if rtt is None:
+            continue
+        if previous is not None:
+            # Interarrival jitter of RFC 3550 (6.4.1): J += (|D| - J) / 16, with D the change
+            # in round trip time. J starts at the first |D| rather than 0, since a sample only
+            # has a handful of packets to converge on.
+            difference = abs(rtt - previous)
+            jitter = difference if jitter is None else jitter + (difference - jitter) / 16
+        previous = rtt
+        received.append(rtt)
+        total += rtt
+
+    stats["packet_loss"] = 100.0 * (len(rtts) - len(received)) / len(rtts)
+    stats["rtts"] = encode_rtts(rtts)
+    if received:
+        ordered = sorted(received)
+        stats["latency_ms"] = total / len(received)
+        stats["jitter_ms"] = jitter or 0.0
+        stats["rtt_min_ms"] = ordered[0]
+        stats["rtt_max_ms"] = ordered[-1]
+        # Nearest-rank 95th percentile
+        stats["rtt_p95_ms"] = ordered[math.ceil(0.95 * len(ordered)) - 1]
+    return stats
+
+
+class ProbeBackend(abc.ABC):
+    """
+    Base of the probe backends. Subclasses implement the RSSI (dBm) and ping probes for
+    their platform; the throughput probes are shared.
+    """
+    name = None
+
+    def __init__(self, config=None):
+        self.config = {**COLLECTOR_CONFIG, **(config or {})}
+        self._speedtest_lock = threading.Lock()
+        self._speedtest_template = None
+        self._speedtest_expires = 0.0
+        # requests sessions aren't meant to be shared by threads: one per speed test thread
+        self._http_local = threading.local()
+        self._payload = b""
+
+    @abc.abstractmethod
+    async def rssi(self):
+        """Signal level in dBm, or None when there is no wireless interface."""
+
+    @abc.abstractmethod
+    async def ping(self):
+        """Ping statistics of summarize_rtts()."""
+
+    # Function to get download and upload speeds in Mbps with the configured throughput probe
+    def speed(self):
+        if self.config["speed_probe"] == "http":
+            return self.http_speed()
+        return self.speedtest_speed()
+
+    # Function to measure with speedtest-cli. Its configuration and best server are fetched once
+    # per speedtest_cache_ttl seconds; every sample then only runs the download and upload.
+    def speedtest_speed(self):
+        st = self._speedtest()
+        try:
+            download_speed = st.download() / 1e6  # Mbps
+            upload_speed = st.upload() / 1e6  # Mbps
+        except Exception:
+            # The server may be gone: pick a new one for the next sample
+            self._speedtest_expires = 0.0
+            raise
+        return download_speed, upload_speed
+
+    def _speedtest(self):
+        with self._speedtest_lock:
+            if self._speedtest_template is None or time.monotonic() >= self._speedtest_expires:
+                with stage("setup"):
+                    template = speedtest.Speedtest()
+                    template.get_best_server()
+                self._speedtest_template = template
+                self._speedtest_expires = time.monotonic() + self.config["speedtest_cache_ttl"]
+            template = self._speedtest_template
+        # Samples may run at the same time: each gets its own results on the cached config and server
+        st = copy.copy(template)
+        st.results = speedtest.SpeedtestResults(
+            client=template.config['client'], opener=template._opener, secure=template._secure
+        )
+        st.results.server = template.best
+        st.results.ping = template.results.ping
+        return st
+
+    # Function to measure by transferring a fixed number of bytes from/to an HTTP endpoint
+    # (http_probe in COLLECTOR_CONFIG). Connections are kept alive between samples.
+    def http_speed(self):
+        settings = self.config["http_probe"]
+        session = self._http_session()
+
+        size = settings["download_bytes"]
+        with session.get(settings["download_url"].format(bytes=size), stream=True,
+                         timeout=settings["timeout"]) as response:
+            response.raise_for_status()
+            # Timed from the response headers, so the request round trip isn't counted as transfer
+            started = time.perf_counter()
+            received = 0
+            for chunk in response.iter_content(64 * 1024):
+                received += len(chunk)
+                if received >= size:
+                    break
+            download_seconds = time.perf_counter() - started
+
+        payload = self._upload_payload(settings["upload_bytes"])
+        started = time.perf_counter()
+        response = session.post(settings["upload_url"], data=payload, timeout=settings["timeout"])
+        upload_seconds = time.perf_counter() - started
+        response.raise_for_status()
+
+        return _mbps(received, download_seconds), _mbps(len(payload), upload_seconds)
+
+    def _http_session(self):
+        session = getattr(self._http_local, "session", None)
+        if session is None:
+            session = self._http_local.session = requests.Session()
+        return session
+
+    def _upload_payload(self, size):
+        # Random bytes, so nothing on the path can compress them away; generated once per size
+        if len(self._payload) != size:
+            self._payload = os.urandom(size)
+        return self._payload
+
+
+def _mbps(size, seconds):
+    return size * 8 / max(seconds, 1e-6) / 1e6
+
+
+class WindowsProbeBackend(ProbeBackend):
+    name = "windows"
+
+    RSSI_COMMAND = ['netsh', 'wlan', 'show', 'interfaces']
+
+    # netsh reports the signal quality in percent; rssi is stored in dBm like on Linux
+    @staticmethod
+    def parse_rssi(output):
+        match = re.search(r"Signal\s+:\s+(\d+)", output)
+        return signal_quality_to_dbm(int(match.group(1))) if match else None
+
+    @staticmethod
+    def parse_ping_output(output):
+        # One line per echo request: "Reply from ...: bytes=32 time=14ms TTL=117" (time<1ms
+        # counts as 1 ms), or "Request timed out." / "Destination host unreachable." when lost
+        rtts = []
+        for line in output.splitlines():
+            match = re.search(r"time[=<]([\d.]+)\s*ms", line)
+            if match:
+                rtts.append(float(match.group(1)))
+            elif re.search(r"timed out|unreachable|general failure|transmit failed", line, re.IGNORECASE):
+                rtts.append(None)
+        return rtts
+
+    def ping_command(self):
+        return ['ping', '-n', str(self.config["ping_count"]), self.config["ping_host"]]
+
+    async def rssi(self):
+        return self.parse_rssi(await run_command(self.RSSI_COMMAND))
+
+    async def ping(self):
+        return summarize_rtts(self.parse_ping_output(await run_command(self.ping_command())))
+
+
+class LinuxProbeBackend(ProbeBackend):
+    name = "linux"
+
+    WIRELESS_PATH = "/proc/net/wireless"
+
+    @staticmethod
+    def parse_wireless(text, interface=None):
+        # Lines after the two header lines: "wlan0: 0000   54.  -56.  -256  0 0 0 0 0  0"
+        for line in text.splitlines()[2:]:
+            name, _, fields = line.partition(":")
+            values = fields.split()
+            if len(values) < 3 or (interface and name.strip() != interface):
+                continue
+            level = float(values[2].rstrip("."))
+            # Drivers without dBm support report 0..255; values above 0 are offsets from 256
+            return int(level - 256 if level > 0 else level)
+        return None
+
+    async def rssi(self):
+        try:
+            with open(self.WIRELESS_PATH) as f:
+                return self.parse_wireless(f.read(), self.config["wireless_interface"])
+        except FileNotFoundError:
+            return None
+
+    async def ping(self):
+        try:
+            sock, raw = _open_icmp_socket()
+        except OSError:
+            # Neither unprivileged nor raw ICMP sockets are allowed: use the ping binary
+            return summarize_rtts(self.parse_ping_output(await run_command(self.ping_command())))
+        try:
+            return summarize_rtts(await self._ping_socket(sock, raw))
+        finally:
+            sock.close()
+
+    def ping_command(self):
+        return ['ping', '-n', '-c', str(self.config["ping_count"]),
+                '-i', str(self.config["ping_interval"]), '-W', str(int(self.config["ping_packet_timeout"]) or 1),
+                self.config["ping_host"]]
+
+    @staticmethod
+    def parse_ping_output(output):
+        rtts = {int(seq): float(rtt) for seq, rtt in re.findall(r"icmp_seq=(\d+).*?time=([\d.]+)", output)}
+        match = re.search(r"(\d+) packets transmitted", output)
+        sent = int(match.group(1)) if match else len(rtts)
+        return [rtts.get(seq) for seq in range(1, sent + 1)]
+
+    async def _ping_socket(self, sock, raw):
+        loop = asyncio.get_running_loop()
+        host = socket.gethostbyname(self.config["ping_host"])
+        sock.setblocking(False)
+        sock.connect((host, 0))
+        identifier = random.randrange(0x10000)
+        rtts = []
+        for sequence in range(self.config["ping_count"]):
+            started = time.perf_counter()
+            await loop.sock_sendall(sock, _echo_request(identifier, sequence))
+            deadline = started + self.config["ping_packet_timeout"]
+            rtt = None
+            while rtt is None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    packet = await asyncio.wait_for(loop.sock_recv(sock, 2048), remaining)
+                except asyncio.TimeoutError:
+                    break
+                # Raw sockets deliver the IP header too; the kernel rewrites the id of datagram sockets
+                if raw:
+                    packet = packet[(packet[0] & 0x0F) * 4:]
+                if len(packet) >= 8:
+                    kind, _, _, reply_id, reply_sequence = struct.unpack("!BBHHH", packet[:8])
+                    if kind == 0 and reply_sequence == sequence and (reply_id == identifier or not raw):
+                        rtt = (time.perf_counter() - started) * 1000
+            rtts.append(rtt)
+            if sequence < self.config["ping_count"] - 1:
+                await asyncio.sleep(max(0.0, started + self.config["ping_interval"] - time.perf_counter()))
+        return rtts
+
+
+def _open_icmp_socket():
+    # Unprivileged ICMP ("ping") sockets need net.ipv4.ping_group_range; raw ones need CAP_NET_RAW
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except OSError as e:
+        if e.errno not in (errno.EACCES, errno.EPERM, errno.EPROTONOSUPPORT):
+            raise
+    return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _echo_request(identifier, sequence):
+    payload = struct.pack("!d", time.time()) + bytes(48)
+    header = struct.pack("!BBHHH", 8, 0, 0, identifier, sequence)
+    checksum = _checksum(header + payload)
+    return struct.pack("!BBHHH", 8, 0, checksum, identifier, sequence) + payload
+
+
+class FakeProbeBackend(ProbeBackend):
+    """
+    Deterministic probe results. Values come from COLLECTOR_CONFIG["fake_probe"]
+    (or the `values` argument); delay_s makes every probe take that long.
+    """
+    name = "fake"
+
+    def __init__(self, config=None, values=None):
+        super().__init__(config)
+        self.values = {**self.config["fake_probe"], **(values or {})}
+
+    async def rssi(self):
+        await asyncio.sleep(self.values["delay_s"])
+        return self.values["rssi"]
+
+    async def ping(self):
+        await asyncio.sleep(self.values["delay_s"])
+        return summarize_rtts(self.values["rtts_ms"])
+
+    def speed(self):
+        time.sleep(self.values["delay_s"])
+        return self.values["download_speed"], self.values["upload_speed"]
+
+
+PROBE_BACKENDS = {
+    backend.name: backend for backend in (WindowsProbeBackend, LinuxProbeBackend, FakeProbeBackend)
+}
+
+_backend = None
+
+
+# Function to get the configured probe backend ("auto" picks the one for this platform)
+def get_probe_backend():
+    global _backend
+    if _backend is None:
+        name = COLLECTOR_CONFIG["probe_backend"]
+        if name == "auto":
+            name = "windows" if sys.platform.startswith("win") else "linux"
+        if name not in PROBE_BACKENDS:
+            raise ValueError(f"Unknown probe backend '{name}', expected one of {sorted(PROBE_BACKENDS)} or 'auto'")
+        _backend = PROBE_BACKENDS[name]()
+    return _backend
@@ -0,0 +1,244 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from src.config import SCHEDULER_CONFIG
+
+# Adaptive sampling: every location is probed on its own interval, which starts at
+# base_interval, shrinks while its metrics look degraded and grows again once they are stable.
+#
+#   degraded - packet loss above loss_threshold (or the ping failed), latency spiking above
+#              latency_spike_factor x its usual level, or RSSI dropped rssi_drop below it
+#   stable   - anything else; after stable_samples stable samples in a row the interval backs off
+#
+# "Usual level" is an exponential moving average over the stable samples of the location.
+# Budgets cap the probes started in any rolling hour, per location and in total; a location
+# that is due but out of budget waits until its oldest probe in the window is an hour old.
+# The total budget (max_probes_per_hour) is one ProbeBudget shared by every scheduler of the
+# process, so collection jobs running side by side (src/jobs.py) stay within it together.
+#
+# A run holds at most one sample per location: the scheduler allocates a new run number as
+# soon as a location comes up again, so the dashboards keep seeing one value per run.
+
+HOUR = 3600.0
+
+
+class ProbeBudget:
+    """Start times of the probes of the last hour, capped at `per_hour` (None: unlimited)."""
+
+    def __init__(self, per_hour):
+        self.per_hour = per_hour
+        self._probes = deque()
+        self._lock = Lock()
+
+    def _expire(self, now):
+        while self._probes and self._probes[0] <= now - HOUR:
+            self._probes.popleft()
+
+    def count(self, now=None):
+        with self._lock:
+            self._expire(time.monotonic() if now is None else now)
+            return len(self._probes)
+
+    # Function to count a probe starting at `now` if the budget allows it.
+    # Returns 0 when it did, otherwise the seconds until the budget allows one.
+    def try_take(self, now):
+        with self._lock:
+            self._expire(now)
+            if self.per_hour is not None and len(self._probes) >= self.per_hour:
+                return self._probes[len(self._probes) - self.per_hour] + HOUR - now
+            self._probes.append(now)
+            return 0.0
+
+    # Function to count a probe that runs regardless of the budget (e.g. a one-pass run)
+    def record(self, now=None):
+        with self._lock:
+            self._probes.append(time.monotonic() if now is None else now)
+
+
+_probe_budget = None
+_probe_budget_lock = Lock()
+
+
+# Function to get the total probe budget shared by all schedulers of the process
+def get_probe_budget():
+    global _probe_budget
+    with _probe_budget_lock:
+        if _probe_budget is None:
+            _probe_budget = ProbeBudget(SCHEDULER_CONFIG["max_probes_per_hour"])
+        return _probe_budget
+
+
+class LocationState:
+
+    def __init__(self, location, interval):
+        self.location = location
+        self.name = location[0]
+        self.interval = interval
+        self.next_due = 0.0
+        self.running = False
+        self.stable_streak = 0
+        self.latency_baseline = None
+        self.rssi_baseline = None
+        self.degraded = False
+        self.probes = deque()        # start times of the probes within the last hour
+
+    def as_dict(self, now):
+        return {
+            "location": self.name,
+            "interval": round(self.interval, 1),
+            "due_in": round(max(0.0, self.next_due - now), 1),
+            "running": self.running,
+            "degraded": self.degraded,
+            "probes_last_hour": len(self.probes)
+        }
+
+
+class AdaptiveScheduler:
+    """
+    Samples the given locations until `stop_event` is set.
+    `collect(location, run_no)` takes and stores one sample and returns its measurement
+    document (None when the probes failed); `next_run_no()` allocates a run number.
+    `budget` is the total probe budget, the one shared by the process by default.
+    """
+
+    def __init__(self, location_list, collect, next_run_no, stop_event, config=None, budget=None):
+        self.config = {**SCHEDULER_CONFIG, **(config or {})}
+        self._budget = budget or get_probe_budget()
+        self._collect = collect
+        self._next_run_no = next_run_no
+        self._stop_event = stop_event
+        self._lock = Lock()
+        self._states = [LocationState(location, self.config["base_interval"]) for location in location_list]
+        self._run_no = None
+        self._run_date = None
+        self._run_locations = set()
+
+    # Function to sample until stop_event is set; returns once running probes have finished
+    def run(self):
+        workers = max(1, min(self.config["max_workers"], len(self._states)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scheduler") as pool:
+            while not self._stop_event.is_set():
+                now = time.monotonic()
+                for state in self._due(now):
+                    run_no = self._run_for(state)
+                    pool.submit(self._sample, state, run_no, now)
+                self._stop_event.wait(self._sleep_time(time.monotonic()))
+        print("Scheduled collection stopped.")
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            return {
+                "run_no": self._run_no,
+                "probes_last_hour": self._budget.count(now),
+                "max_probes_per_hour": self._budget.per_hour,
+                "locations": [state.as_dict(now) for state in self._states]
+            }
+
+    def _due(self, now):
+        due = []
+        with self._lock:
+            self._expire(now)
+            # Most overdue first, so a degraded location isn't starved by the total budget
+            for state in sorted(self._states, key=lambda s: s.next_due):
+                if state.running or state.next_due > now:
+                    continue
+                # Count the probe right away, so the budget checks of the next locations
+                # (and of the other schedulers) see it
+                wait = self._budget_wait(state, now) or self._budget.try_take(now)
+                if wait > 0:
+                    state.next_due = now + wait
+                    continue
+                state.running = True
+                state.probes.append(now)
+                due.append(state)
+        return due
+
+    def _expire(self, now):
+        for state in self._states:
+            while state.probes and state.probes[0] <= now - HOUR:
+                state.probes.popleft()
+
+    def _location_budget(self, state):
+        budget = self.config["location_budget_per_hour"]
+        if isinstance(budget, dict):
+            return budget.get(state.name, budget.get("default"))
+        return budget
+
+    # Seconds until the location budget allows another probe of `state` (0 when it already does)
+    def _budget_wait(self, state, now):
+        budget = self._location_budget(state)
+        if budget is not None and len(state.probes) >= budget:
+            return state.probes[len(state.probes) - budget] + HOUR - now
+        return 0.0
+
+    def _sleep_time(self, now):
+        with self._lock:
+            pending = [state.next_due for state in self._states if not state.running]
+        if not pending:
+            return self.config["tick"]
+        return min(self.config["tick"], max(0.0, min(pending) - now))
+
+    def _run_for(self, state):
+        # A location coming up again (or a new day) starts the next run
+        today = time.strftime("%Y-%m-%d")
+        with self._lock:
+            if self._run_no is None or state.name in self._run_locations or today != self._run_date:
+                self._run_no = self._next_run_no()
+                self._run_date = today
+                self._run_locations = set()
+                print(f"[Scheduler] Starting run {self._run_no}")
+            self._run_locations.add(state.name)
+            return self._run_no
+
+    def _sample(self, state, run_no, started):
+        try:
+            measurement = self._collect(state.location, run_no)
+        except Exception as e:
+            print(f"❌ [Scheduler] Error collecting {state.name}: {e}")
+            measurement = None
+        with self._lock:
+            self._adapt(state, measurement)
+            state.next_due = max(started + state.interval, time.monotonic())
+            state.running = False
+
+    # Function to update the interval of a location from its latest sample
+    def _adapt(self, state, measurement):
+        config = self.config
+        state.degraded = self._is_degraded(state, measurement)
+        if state.degraded:
+            state.stable_streak = 0
+            interval = max(min(config["min_interval"], state.interval), state.interval * config["speedup_factor"])
+            if interval < state.interval:
+                print(f"⚠️ [Scheduler] {state.name} degraded, sampling every {interval:.0f}s")
+            state.interval = interval
+            return
+
+        state.stable_streak += 1
+        alpha = config["baseline_alpha"]
+        for field, attribute in [("latency_ms", "latency_baseline"), ("rssi", "rssi_baseline")]:
+            value = measurement.get(field)
+            if value is not None:
+                baseline = getattr(state, attribute)
+                setattr(state, attribute, value if baseline is None else baseline + alpha * (value - baseline))
+        if state.stable_streak >= config["stable_samples"]:
+            state.interval = min(config["max_interval"], state.interval * config["backoff_factor"])
+
+    def _is_degraded(self, state, measurement):
+        config = self.config
+        if measurement is None:
+            return True
+        packet_loss = measurement.get("packet_loss")
+        if packet_loss is None or packet_loss > config["loss_threshold"]:
+            return True
+        latency = measurement.get("latency_ms")
+        if (latency is not None and state.latency_baseline is not None
+                and latency > state.latency_baseline * config["latency_spike_factor"]
+                and latency - state.latency_baseline >= config["latency_spike_min_ms"]):
+            return True
+        rssi = measurement.get("rssi")
+        if rssi is not None and state.rssi_baseline is not None and rssi < state.rssi_baseline - config["rssi_drop"]:
+            return True
+        return False
@@ -0,0 +1,162 @@
+import os
+import atexit
+import json
+import gzip
+import base64
+import glob
+import time
+from datetime import datetime
+from threading import Lock
+from src.config import SPOOL_CONFIG
+
+# Local append-only log of every sample the collector takes, one JSON document per line:
+#
+#   data/spool/wifi_data.20250405-140312.jsonl      - file currently written
+#   data/spool/wifi_data.20250404-090001.jsonl.gz   - rotated (and compressed) files
+#
+# A sample is one line appended to the end, so writing never rereads the file and a
+# crash can at most leave a torn last line, which the reader skips.
+# Records use the measurement layout of Database/models.py with the timestamp as text
+# and the binary rtts field base64-encoded.
+
+SPOOL_PREFIX = "wifi_data"
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class SpoolWriter:
+    """
+    Appends records to the active spool file.
+    Lines are flushed on every append; fsync (the expensive part) is batched and runs
+    once `fsync_every` records are pending or `fsync_interval` seconds have passed.
+    The file is rotated once it is `max_bytes` large or `max_age` seconds old.
+    """
+
+    def __init__(self, directory=None, config=None):
+        self.config = {**SPOOL_CONFIG, **(config or {})}
+        self.directory = directory or self.config["directory"]
+        self._lock = Lock()
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def append(self, record):
+        line = json.dumps(record, default=_serialize) + "\n"
+        with self._lock:
+            if self._file is None or self._rotation_due():
+                self._rotate()
+            self._file.write(line)
+            self._file.flush()
+            self._pending += 1
+            if (self._pending >= self.config["fsync_every"]
+                    or time.monotonic() - self._synced_at >= self.config["fsync_interval"]):
+                self._sync()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            self._close_active()
+
+    def _sync(self):
+        if self._pending:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def _rotation_due(self):
+        return (self._file.tell() >= self.config["max_bytes"]
+                or time.monotonic() - self._opened_at >= self.config["max_age"])
+
+    def _rotate(self):
+        self._close_active()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"{SPOOL_PREFIX}.{stamp}.jsonl")
+        suffix = 1
+        while os.path.exists(path) or os.path.exists(path + ".gz"):
+            path = os.path.join(self.directory, f"{SPOOL_PREFIX}.{stamp}-{suffix}.jsonl")
+            suffix += 1
+        self._file = open(path, "a", encoding="utf-8")
+        self._path = path
+        self._opened_at = time.monotonic()
+
+    def _close_active(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        self._sync()
+        self._file.close()
+        path, self._file, self._path = self._path, None, None
+        if self.config["compress"] and os.path.getsize(path):
+            compress_file(path)
+        elif not os.path.getsize(path):
+            os.remove(path)
+
+
+# Function to gzip a finished spool file; the plain file is removed once the .gz is complete
+def compress_file(path):
+    try:
+        tmp_path = path + ".gz.tmp"
+        with open(path, "rb") as source, gzip.open(tmp_path, "wb") as target:
+            while True:
+                chunk = source.read(1 << 20)
+                if not chunk:
+                    break
+                target.write(chunk)
+        os.replace(tmp_path, path + ".gz")
+        os.remove(path)
+    except Exception as e:
+        print(f"⚠️ Could not compress {path}: {e}")
+
+
+def spool_files(directory=None):
+    directory = directory or SPOOL_CONFIG["directory"]
+    paths = glob.glob(os.path.join(directory, f"{SPOOL_PREFIX}.*.jsonl")) + \
+        glob.glob(os.path.join(directory, f"{SPOOL_PREFIX}.*.jsonl.gz"))
+    # Names start with the creation time, so sorting by name is chronological
+    return sorted(paths, key=lambda path: os.path.basename(path).split(".")[1])
+
+
+def read_spool(directory=None):
+    """
+    Stream the records of every spool file, oldest first, one dict at a time.
+    Lines that can't be parsed (e.g. torn by a crash) are skipped.
+    """
+    for path in spool_files(directory):
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except (OSError, EOFError) as e:
+            print(f"⚠️ Could not read spool file {path}: {e}")
+
+
+_spool = None
+_spool_lock = Lock()
+
+
+# Function to get the process-wide spool writer
+def get_spool():
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            _spool = SpoolWriter()
+            atexit.register(_spool.close)
+        return _spool
@@ -0,0 +1,172 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Per-stage timings of the collector, kept in memory as histograms per location.
+#
+# Stages of a sample (collect_location in src/main.py):
+#   setup     - probe backend lookup, and the speedtest.net config/server fetch when it isn't cached
+#   speed_wait - waiting for the throughput probe of another sample to finish (one at a time)
+#   speed     - throughput probe (speedtest or http), setup included
+#   ping      - ping probe
+#   rssi      - RSSI probe (a subprocess on Windows)
+#   measure   - all probes of the sample; they run at the same time, so about the slowest one
+#   spool     - JSON line appended to the local spool (src/spool.py)
+#   db_queue  - handing the document to the write-behind writer, blocks while its queue is full
+#   total     - the whole sample
+# and around it:
+#   db_write  - insert_many of the batch holding the sample (src/writer.py, per location of the batch)
+#   sleep     - pause after the location when locations are probed one after another
+#
+# The probe stages (setup to measure) are also stored with the sample, in milliseconds, as its
+# "timings_ms" field; the later ones run once the document is built and only go into the
+# histograms. The collector publishes the histograms with its heartbeat (src/collector.py);
+# the web app serves them at GET /metrics.
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket takes everything above
+BUCKET_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        index = next((i for i, bound in enumerate(BUCKET_BOUNDS) if seconds <= bound), len(BUCKET_BOUNDS))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    # Function to estimate a quantile by interpolating inside its bucket
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKET_BOUNDS[index - 1] if index else 0.0
+                upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else None,
+            "min": _round(self.min),
+            "max": _round(self.max),
+            "p50": _round(self.quantile(0.5)),
+            "p95": _round(self.quantile(0.95)),
+            "p99": _round(self.quantile(0.99)),
+            # counts[i] holds durations up to buckets[i]; the extra last count those above
+            "buckets": list(BUCKET_BOUNDS),
+            "counts": list(self.counts)
+        }
+
+
+def _round(value):
+    return None if value is None else round(value, 4)
+
+
+class TimingRegistry:
+    """Histograms of stage durations (seconds), one per (location, stage)."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, location, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get((location, stage))
+            if histogram is None:
+                histogram = self._histograms[(location, stage)] = Histogram()
+            histogram.add(seconds)
+
+    # Function to get a list of {"location", "stage", histogram summary...}.
+    # A list rather than a dict keyed by location, so any location name can be stored in MongoDB.
+    def snapshot(self):
+        with self._lock:
+            return [
+                {"location": location, "stage": stage, **histogram.snapshot()}
+                for (location, stage), histogram in sorted(self._histograms.items(), key=lambda item: str(item[0]))
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+_registry = TimingRegistry()
+
+
+# Function to get the process-wide timing registry
+def get_timings():
+    return _registry
+
+
+class SampleTimer:
+    """
+    Times the stages of one sample of `location`: every stage goes into the registry and
+    into `durations`, which is stored with the sample.
+    Code that doesn't know the sample (e.g. the probes) reaches it with stage(), on any
+    thread that runs inside activate().
+    """
+
+    def __init__(self, location, registry=None):
+        self.location = location
+        self.registry = registry or _registry
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            # A stage that runs twice (e.g. setup) adds up
+            self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+        self.registry.record(self.location, stage, seconds)
+
+    @contextmanager
+    def stage(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    @contextmanager
+    def activate(self):
+        previous = getattr(_current, "timer", None)
+        _current.timer = self
+        try:
+            yield self
+        finally:
+            _current.timer = previous
+
+    # Function to get the durations for the stored sample, in milliseconds
+    def as_metadata(self):
+        with self._lock:
+            return {stage: round(1000 * seconds, 1) for stage, seconds in self.durations.items()}
+
+
+_current = threading.local()
+
+
+# Function to time a stage of the sample timed on this thread; does nothing outside a sample
+@contextmanager
+def stage(name):
+    timer = getattr(_current, "timer", None)
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
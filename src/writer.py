@@ -0,0 +1,206 @@
+import time
+import atexit
+from queue import Queue, Empty, Full
+from threading import Thread, Event, Condition, Lock
+from Database.database import get_db_connection, insert_measurements
+from src.config import WRITER_CONFIG
+from src.offline_buffer import OfflineBuffer
+from src.timings import get_timings
+
+# Write-behind persistence for collected samples.
+# The collector only puts measurement documents on a bounded queue; a background thread
+# writes them to MongoDB with one insert_many per batch, by size or by interval. Probes
+# therefore never wait for a database round trip, except when the queue is full, which
+# slows the producers down instead of growing memory without bound.
+#
+# Every sample is first added to the durable offline buffer (src/offline_buffer.py) and only
+# removed from it once MongoDB has it. A batch that can't be written simply stays there;
+# the writer replays the buffer in bulk, with backoff, until MongoDB is reachable again.
+# Writes are not retried in line, so an outage never holds up the queue or the probes.
+
+
+# Results of MeasurementWriter.put()
+QUEUED = "queued"        # on the queue, written with the next batch
+BUFFERED = "buffered"    # queue full: kept in the offline buffer, written when it is replayed
+DROPPED = "dropped"      # queue full and no offline buffer: not written at all
+
+
+class MeasurementWriter:
+
+    def __init__(self, config=None):
+        self.config = {**WRITER_CONFIG, **(config or {})}
+        self._queue = Queue(maxsize=self.config["max_queue"])
+        self._pending = 0               # queued or being written
+        self._pending_changed = Condition()
+        self._flush_requested = Event()
+        self._stopping = Event()
+        self._thread = None
+        self._start_lock = Lock()
+        self._buffer = None
+        self._offline = False
+        self._replay_interval = self.config["replay_interval"]
+        # The buffer holds samples nobody else will write: leftovers of a previous run
+        # (replayed right away), an outage, or a full queue
+        self._replay_needed = True
+        self._next_replay = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._buffer is None:
+                try:
+                    self._buffer = OfflineBuffer(self.config["buffer_path"])
+                except Exception as e:
+                    print(f"⚠️ Offline buffer unavailable, samples are only kept in memory: {e}")
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = Thread(target=self._run, name="measurement-writer", daemon=True)
+                self._thread.start()
+
+    # Function to queue a measurement document. Blocks while the queue is full (backpressure)
+    # and gives up after put_timeout seconds. Returns QUEUED, BUFFERED or DROPPED.
+    def put(self, measurement):
+        self.start()
+        buffered = False
+        if self._buffer is not None:
+            try:
+                self._buffer.add([measurement])
+                buffered = True
+            except Exception as e:
+                print(f"⚠️ Offline buffer add failed: {e}")
+        with self._pending_changed:
+            self._pending += 1
+        try:
+            self._queue.put(measurement, timeout=self.config["put_timeout"])
+            return QUEUED
+        except Full:
+            self._done(1)
+            if not buffered:
+                print(f"❌ Write queue full, measurement {measurement.get('_id')} is dropped")
+                return DROPPED
+            self._replay_needed = True
+            print(f"⚠️ Write queue full, measurement {measurement.get('_id')} waits in the offline buffer")
+            return BUFFERED
+
+    # Function to write everything queued so far. Returns False if it didn't finish in time.
+    def flush(self, timeout=None):
+        timeout = self.config["flush_timeout"] if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        self._flush_requested.set()
+        with self._pending_changed:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._thread is None or not self._thread.is_alive():
+                    print(f"⚠️ {self._pending} measurement(s) not written yet")
+                    return False
+                self._pending_changed.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        flushed = self.flush(timeout)
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        return flushed
+
+    def _done(self, count):
+        with self._pending_changed:
+            self._pending -= count
+            if not self._pending:
+                self._flush_requested.clear()
+            self._pending_changed.notify_all()
+
+    def _buffer_call(self, method, *args):
+        if self._buffer is None:
+            return None
+        try:
+            return getattr(self._buffer, method)(*args)
+        except Exception as e:
+            print(f"⚠️ Offline buffer {method} failed: {e}")
+            return None
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            if self._replay_needed and time.monotonic() >= self._next_replay:
+                self._replay()
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except Empty:
+                continue
+            # Fill the batch until it is full, the interval is over or a flush is requested
+            deadline = time.monotonic() + self.config["flush_interval"]
+            while len(batch) < self.config["batch_size"]:
+                urgent = self._flush_requested.is_set() or self._stopping.is_set()
+                remaining = 0 if urgent else deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=min(remaining, 0.1)))
+                except Empty:
+                    if remaining <= 0:
+                        break
+            self._write(batch)
+
+    def _write(self, batch):
+        # While MongoDB is known to be down the batch just stays in the offline buffer
+        if not self._offline or self._buffer is None:
+            self._insert(batch)
+        self._done(len(batch))
+
+    # Function to insert a batch and drop it from the offline buffer. Returns False on failure.
+    def _insert(self, batch):
+        started = time.perf_counter()
+        try:
+            inserted = insert_measurements(get_db_connection(), batch)
+        except Exception as e:
+            print(f"❌ Error storing {len(batch)} measurement(s) in MongoDB: {e}")
+            self._go_offline()
+            return False
+        # The whole batch counts for every location it holds
+        seconds = time.perf_counter() - started
+        for location in {doc.get("location") for doc in batch}:
+            get_timings().record(location, "db_write", seconds)
+        print(f"✅ Stored {inserted} measurement(s)")
+        self._buffer_call("remove", [doc["_id"] for doc in batch])
+        if self._offline:
+            self._offline = False
+            self._replay_interval = self.config["replay_interval"]
+            print("✅ MongoDB reachable again")
+        return True
+
+    def _go_offline(self):
+        if self._offline:
+            self._replay_interval = min(2 * self._replay_interval, self.config["max_replay_interval"])
+        self._offline = True
+        self._replay_needed = True
+        self._next_replay = time.monotonic() + self._replay_interval
+
+    # Function to drain the offline buffer into MongoDB in bulk, oldest samples first.
+    # Samples may also still be queued in memory; their ids make writing them twice harmless.
+    def _replay(self):
+        self._next_replay = time.monotonic() + self._replay_interval
+        replayed = 0
+        while not self._stopping.is_set():
+            batch = self._buffer_call("oldest", self.config["replay_batch_size"])
+            if not batch:
+                self._replay_needed = False
+                break
+            if not self._insert(batch):
+                break
+            replayed += len(batch)
+        if replayed:
+            print(f"✅ Replayed {replayed} buffered measurement(s)")
+
+
+_writer = None
+_writer_lock = Lock()
+
+
+# Function to get the process-wide writer; it is flushed when the process exits
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MeasurementWriter()
+            atexit.register(_writer.close)
+        return _writer
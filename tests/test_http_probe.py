@@ -0,0 +1,94 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pytest
+import requests
+from src import probes
+from src.probes import LinuxProbeBackend
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Stand-in for the speed.cloudflare.com endpoints of the http probe."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/slow":
+            time.sleep(1.0)
+        if url.path == "/broken":
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        size = int(parse_qs(url.query)["bytes"][0])
+        self.send_response(200)
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        self.wfile.write(b"\0" * size)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.uploaded.append(len(body))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    httpd.daemon_threads = True
+    httpd.uploaded = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def backend_for(server, path="/__down", timeout=5):
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return LinuxProbeBackend(config={"speed_probe": "http", "http_probe": {
+        "download_url": base + path + "?bytes={bytes}",
+        "upload_url": base + "/__up",
+        "download_bytes": 1_000_000,
+        "upload_bytes": 250_000,
+        "timeout": timeout
+    }})
+
+
+def test_http_speed_from_transferred_bytes_and_elapsed_time(server, monkeypatch):
+    # The probe reads the clock at the start and end of the download, then of the upload:
+    # 2 s for 1 MB down (4 Mbps) and 0.5 s for 250 kB up (4 Mbps)
+    readings = iter([10.0, 12.0, 20.0, 20.5])
+    real_clock = time.perf_counter
+    probe_thread = threading.current_thread()
+    monkeypatch.setattr(probes.time, "perf_counter",
+                        lambda: next(readings) if threading.current_thread() is probe_thread else real_clock())
+
+    download, upload = backend_for(server).speed()
+
+    assert download == pytest.approx(1_000_000 * 8 / 2.0 / 1e6)
+    assert upload == pytest.approx(250_000 * 8 / 0.5 / 1e6)
+    assert server.uploaded == [250_000]
+
+
+def test_http_speed_reuses_the_upload_payload(server):
+    backend = backend_for(server)
+    backend.speed()
+    backend.speed()
+    assert server.uploaded == [250_000, 250_000]
+    assert len(backend._payload) == 250_000
+
+
+def test_http_speed_times_out(server):
+    with pytest.raises(requests.exceptions.Timeout):
+        backend_for(server, path="/slow", timeout=0.2).speed()
+
+
+def test_http_speed_fails_on_error_status(server):
+    with pytest.raises(requests.exceptions.HTTPError):
+        backend_for(server, path="/broken").speed()
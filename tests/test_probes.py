@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from Database.models import decode_rtts
+from src.probes import FakeProbeBackend, LinuxProbeBackend, WindowsProbeBackend, summarize_rtts
+
+WIRELESS_HEADER = (
+    "Inter-| sta-|   Quality        |   Discarded packets               | Missed | WE\n"
+    " face | tus | link level noise |  nwid  crypt   frag  retry   misc | beacon | 22\n"
+)
+
+NETSH_OUTPUT = """
+    Name                   : Wi-Fi
+    State                  : connected
+    SSID                   : campus
+    Signal                 : 80%
+"""
+
+WINDOWS_PING_OUTPUT = """
+Pinging 8.8.8.8 with 32 bytes of data:
+Reply from 8.8.8.8: bytes=32 time=14ms TTL=117
+Request timed out.
+Reply from 8.8.8.8: bytes=32 time<1ms TTL=117
+Reply from 8.8.8.8: bytes=32 time=21ms TTL=117
+Destination host unreachable.
+
+Ping statistics for 8.8.8.8:
+    Packets: Sent = 5, Received = 3, Lost = 2 (40% loss),
+"""
+
+
+def test_parse_wireless_dbm():
+    text = WIRELESS_HEADER + " wlan0: 0000   54.  -56.  -256        0      0      0      0      0        0\n"
+    assert LinuxProbeBackend.parse_wireless(text) == -56
+
+
+def test_parse_wireless_unsigned_level():
+    # Drivers without dBm support report 0..255: 200 is -56 dBm
+    text = WIRELESS_HEADER + " wlan0: 0000   54.  200.  0        0      0      0      0      0        0\n"
+    assert LinuxProbeBackend.parse_wireless(text) == -56
+
+
+def test_parse_wireless_picks_interface():
+    text = WIRELESS_HEADER + (
+        " wlan0: 0000   54.  -70.  -256        0      0      0      0      0        0\n"
+        " wlan1: 0000   60.  -48.  -256        0      0      0      0      0        0\n"
+    )
+    assert LinuxProbeBackend.parse_wireless(text) == -70
+    assert LinuxProbeBackend.parse_wireless(text, "wlan1") == -48
+    assert LinuxProbeBackend.parse_wireless(text, "wlan2") is None
+    assert LinuxProbeBackend.parse_wireless(WIRELESS_HEADER) is None
+
+
+def test_parse_rssi_converts_signal_quality_to_dbm():
+    assert WindowsProbeBackend.parse_rssi(NETSH_OUTPUT) == -60
+    assert WindowsProbeBackend.parse_rssi("There is no wireless interface on the system.") is None
+
+
+def test_parse_ping_output_counts_lost_requests():
+    assert WindowsProbeBackend.parse_ping_output(WINDOWS_PING_OUTPUT) == [14.0, None, 1.0, 21.0, None]
+
+
+def test_summarize_rtts_via_fake_backend():
+    backend = FakeProbeBackend(values={"rtts_ms": [10.0, 14.0, None, 12.0, 20.0]})
+    stats = asyncio.run(backend.ping())
+
+    assert stats["packet_loss"] == pytest.approx(20.0)
+    assert stats["latency_ms"] == pytest.approx(14.0)
+    # J starts at |14 - 10| = 4, then J += (|D| - J) / 16 for D = -2 and D = 8
+    jitter = 4 + (2 - 4) / 16
+    jitter += (8 - jitter) / 16
+    assert stats["jitter_ms"] == pytest.approx(jitter)
+    assert (stats["rtt_min_ms"], stats["rtt_max_ms"], stats["rtt_p95_ms"]) == (10.0, 20.0, 20.0)
+    assert decode_rtts(stats["rtts"]) == [10.0, 14.0, None, 12.0, 20.0]
+
+
+def test_summarize_rtts_all_lost():
+    stats = summarize_rtts([None, None])
+    assert stats["packet_loss"] == 100.0
+    assert stats["latency_ms"] is None and stats["jitter_ms"] is None
+
+
+def test_summarize_rtts_without_samples():
+    assert all(value is None for value in summarize_rtts([]).values())
+
+
+def test_fake_backend_is_deterministic():
+    backend = FakeProbeBackend(values={"rssi": -61, "download_speed": 80.0, "upload_speed": 30.0})
+    assert asyncio.run(backend.rssi()) == -61
+    assert backend.speed() == (80.0, 30.0)